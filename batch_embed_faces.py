@@ -2,13 +2,16 @@
 
 import cv2
 import os
-import numpy as np
 from embedder import FaceEmbedder
 import vector_db
 import time
 from faker import Faker
 from database.db import SecureFaceDB
 import random
+from image_utils import bgr_to_rgb
+
+# Users accumulated before one bulk INSERT + FAISS add
+BULK_BATCH_SIZE = 500
 
 def embed_and_store_faces(limit=2000):
     """
@@ -44,6 +47,18 @@ def embed_and_store_faces(limit=2000):
     
     success_count = 0
     start_time = time.time()
+    rgb_buffer = None  # Reused across images of the same size
+    pending = []  # (full_name, role_id, department, image_path, embedding) awaiting bulk registration
+
+    def register_pending():
+        nonlocal success_count
+        user_ids = vector_db.register_users_bulk(pending)
+        if user_ids:
+            print(f"✅ Stored {len(user_ids)} users and embeddings")
+            success_count += len(user_ids)
+        else:
+            print(f"❌ Failed to store batch of {len(pending)} users")
+        pending.clear()
 
     with SecureFaceDB() as db:
         roles = db.get_all_roles()
@@ -52,7 +67,7 @@ def embed_and_store_faces(limit=2000):
             return
 
         for i, image_path in enumerate(image_files):
-            if success_count >= limit:
+            if success_count + len(pending) >= limit:
                 print(f"🏁 Reached embedding limit of {limit}. Stopping.")
                 break
 
@@ -64,7 +79,7 @@ def embed_and_store_faces(limit=2000):
                     print(f"⚠️ Could not read image: {image_path}")
                     continue
 
-                img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                img_rgb = rgb_buffer = bgr_to_rgb(frame, rgb_buffer)
                 
                 # Get embedding using the direct insightface method
                 faces = embedder.app.get(img_rgb)
@@ -72,30 +87,16 @@ def embed_and_store_faces(limit=2000):
                 if len(faces) > 0:
                     embedding = faces[0].embedding
                     
-                    # Normalize the embedding
-                    normalized_embedding = embedding / np.linalg.norm(embedding)
-                    
                     # Generate fake user data
                     full_name = fake.name()
                     departments = ['Engineering', 'HR', 'Sales', 'Marketing', 'Product']
                     department = random.choice(departments)
                     role_id = random.choice([role['role_id'] for role in roles])
                     
-                    # Create the user
-                    user_id = db.create_user(full_name, role_id, department, image_path)
-                    
-                    if user_id:
-                        print(f"✅ User '{full_name}' created with user_id: {user_id}")
-                        
-                        # Add to vector database
-                        faiss_id = vector_db.add_embedding(normalized_embedding, user_id)
-                        if faiss_id != -1:
-                            print(f"✅ Successfully embedded and stored user ID {user_id} with FAISS ID {faiss_id}")
-                            success_count += 1
-                        else:
-                            print(f"❌ Failed to store embedding for user ID {user_id}")
-                    else:
-                        print("❌ Failed to create user in the database.")
+                    # Queue the user; embeddings are normalized per batch in vector_db.register_users_bulk
+                    pending.append((full_name, role_id, department, image_path, embedding))
+                    if len(pending) >= BULK_BATCH_SIZE:
+                        register_pending()
                 else:
                     print(f"⚠️ No face detected in {image_path}")
 
@@ -105,15 +106,16 @@ def embed_and_store_faces(limit=2000):
             if (i + 1) % 100 == 0:
                 print(f"--- Progress: {success_count}/{limit} embeddings stored ---")
 
+    if pending:
+        register_pending()
+
     end_time = time.time()
     print("\n" + "="*50)
     print("✅ Batch embedding and user creation process finished.")
     print(f"Successfully created {success_count} new users and embeddings.")
     print(f"Total time: {end_time - start_time:.2f} seconds.")
     
-    # Save the updated index
-    print("💾 Saving FAISS index...")
-    vector_db.save_index("faiss_index.bin")
+    # vector_db.register_users_bulk() saves the index after each batch
     print("✅ Index saved.")
 
 if __name__ == "__main__":
@@ -1,8 +1,38 @@
 import cv2
+import glob
+import json
+import os
+import re
+import sys
+
+# Detected cameras are persisted here, keyed by the V4L2 sensor fingerprint
+CAMERA_CACHE_PATH = os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "secureface",
+    "cameras.json",
+)
+V4L2_SYSFS_DIR = "/sys/class/video4linux"
+
+
+def enumerate_v4l2_devices():
+    """
+    List camera indices from the /dev/video* device nodes (Linux only).
+
+    Returns:
+        list: Sorted camera indices that have a device node
+    """
+    indices = []
+    for path in glob.glob("/dev/video*"):
+        match = re.fullmatch(r"/dev/video(\d+)", path)
+        if match:
+            indices.append(int(match.group(1)))
+    return sorted(indices)
+
 
 def detect_cameras(max_cameras=10):
     """
     Detect available cameras by trying to open each camera index.
+    On Linux only indices with a /dev/video* node are probed, via the V4L2 backend.
     
     Args:
         max_cameras (int): Maximum number of camera indices to test
@@ -10,6 +40,21 @@ def detect_cameras(max_cameras=10):
     Returns:
         list: List of available camera indices
     """
+    if sys.platform.startswith("linux"):
+        available_cameras = []
+        for i in enumerate_v4l2_devices():
+            if i >= max_cameras:
+                break
+            try:
+                # Opening is enough - metadata-only nodes fail to open as capture devices
+                cap = cv2.VideoCapture(i, cv2.CAP_V4L2)
+                if cap.isOpened():
+                    available_cameras.append(i)
+                cap.release()
+            except Exception:
+                pass
+        return available_cameras
+
     available_cameras = []
     
     for i in range(max_cameras):
@@ -27,6 +72,64 @@ def detect_cameras(max_cameras=10):
     
     return available_cameras
 
+
+def v4l2_fingerprint():
+    """
+    Fingerprint the attached V4L2 devices from sysfs (Linux only).
+
+    Returns:
+        list or None: Sorted [device, sensor name] pairs, or None if unavailable
+    """
+    try:
+        devices = sorted(os.listdir(V4L2_SYSFS_DIR))
+    except OSError:
+        return None
+
+    fingerprint = []
+    for device in devices:
+        try:
+            with open(os.path.join(V4L2_SYSFS_DIR, device, "name")) as f:
+                name = f.read().strip()
+        except OSError:
+            name = ""
+        fingerprint.append([device, name])
+    return fingerprint
+
+
+def cached_cameras(refresh=False):
+    """
+    Detect cameras, reusing the on-disk result while the device fingerprint is unchanged.
+
+    Args:
+        refresh (bool): Ignore the cached result and probe again
+
+    Returns:
+        list: List of available camera indices
+    """
+    fingerprint = v4l2_fingerprint()
+    if fingerprint is None:
+        # No sysfs fingerprint to validate against (non-Linux): always probe
+        return detect_cameras()
+
+    if not refresh:
+        try:
+            with open(CAMERA_CACHE_PATH) as f:
+                data = json.load(f)
+            if data["fp"] == fingerprint:
+                return data["cams"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    cameras = detect_cameras()
+    try:
+        os.makedirs(os.path.dirname(CAMERA_CACHE_PATH), exist_ok=True)
+        with open(CAMERA_CACHE_PATH, "w") as f:
+            json.dump({"fp": fingerprint, "cams": cameras}, f)
+    except OSError:
+        pass
+    return cameras
+
+
 if __name__ == "__main__":
     cameras = detect_cameras()
     if cameras:
@@ -34,4 +137,4 @@ if __name__ == "__main__":
         for cam in cameras:
             print(f"  Camera {cam}: /dev/video{cam}")
     else:
-        print("No cameras found")
\ No newline at end of file
+        print("No cameras found")
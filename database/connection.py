@@ -1,26 +1,60 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import threading
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from .config import DatabaseConfig
 
+# Connections are kept open and handed out from a process-wide pool, so a
+# connect()/disconnect() pair costs a pool checkout instead of a TCP + auth handshake.
+# The pool closes returned connections once more than POOL_MIN_CONN are idle, so
+# only that many survive between calls; size it for the usual number of concurrent users.
+POOL_MIN_CONN = 4
+POOL_MAX_CONN = 8
+POOL_KEEPALIVE_IDLE = 30  # Seconds idle before the first keepalive probe
 
-class DatabaseConnection:
-    """Handles database connections and operations"""
+_pool = None
+_pool_lock = threading.Lock()
 
-    def __init__(self):
-        self.connection = None
-        self.cursor = None
 
-    def connect(self):
-        """Establishes a connection to the database"""
-        try:
-            self.connection = psycopg2.connect(
+def get_pool():
+    """Returns the process-wide connection pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(
+                POOL_MIN_CONN,
+                POOL_MAX_CONN,
                 host=DatabaseConfig.HOST,
                 port=DatabaseConfig.PORT,
                 database=DatabaseConfig.DATABASE,
                 user=DatabaseConfig.USER,
                 password=DatabaseConfig.PASSWORD,
                 cursor_factory=RealDictCursor,
+                # Pooled connections sit idle between calls; TCP keepalives let the
+                # OS detect a dropped server instead of hanging on the next query
+                keepalives=1,
+                keepalives_idle=POOL_KEEPALIVE_IDLE,
+                keepalives_interval=10,
+                keepalives_count=3,
             )
+        return _pool
+
+
+class DatabaseConnection:
+    """Handles database connections and operations"""
+
+    def __init__(self):
+        self.connection = None
+        self.cursor = None
+
+    def connect(self):
+        """Checks out a connection from the pool"""
+        try:
+            pool = get_pool()
+            self.connection = pool.getconn()
+            if self.connection.closed:
+                # The server dropped this pooled connection; discard it and take a fresh one
+                pool.putconn(self.connection, close=True)
+                self.connection = pool.getconn()
             self.cursor = self.connection.cursor()
             print("Database connection established successfully")
             return True
@@ -31,12 +65,12 @@ class DatabaseConnection:
             return False
 
     def disconnect(self):
-        """Closes the database connection"""
+        """Returns the connection to the pool (rolling back any open transaction)"""
         try:
             if self.cursor:
                 self.cursor.close()
             if self.connection:
-                self.connection.close()
+                get_pool().putconn(self.connection, close=bool(self.connection.closed))
             print("Database connection closed")
         except Exception as e:
             print(f"Error closing database connection: {e}")
@@ -119,6 +153,40 @@ class DatabaseConnection:
                 self.connection.rollback()
             return False
 
+    def execute_in_transaction(self, query, params=None):
+        """
+        Executes a query without committing, so several statements can be committed
+        or rolled back together. Returns the fetched rows for queries that produce
+        them, else the affected row count. Errors propagate to the caller.
+        """
+        self._ensure_connection()
+        self.cursor.execute(query, params)
+        if self.cursor.description is not None:
+            return self.cursor.fetchall()
+        return self.cursor.rowcount
+
+    def commit(self):
+        """Commits the current transaction"""
+        self._ensure_connection()
+        self.connection.commit()
+
+    def rollback(self):
+        """Rolls back the current transaction"""
+        if self.connection and not self.connection.closed:
+            self.connection.rollback()
+
+    def execute_values_in_transaction(self, query, params_list, page_size=500, fetch=False):
+        """
+        Executes a multi-row INSERT ... VALUES %s query without committing, so several
+        statements can be committed or rolled back together. Returns the RETURNING rows
+        when fetch=True, else the affected row count. Errors propagate to the caller.
+        """
+        self._ensure_connection()
+        result = execute_values(
+            self.cursor, query, params_list, page_size=page_size, fetch=fetch
+        )
+        return result if fetch else self.cursor.rowcount
+
     def __enter__(self):
         """Context manager entry"""
         self.connect()
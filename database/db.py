@@ -34,6 +34,15 @@ class SecureFaceDB:
         result = self.db.execute_query(query, (user_id,))
         return result[0] if result else None
     
+    def get_users_by_ids(self, user_ids):
+        """Get multiple users by ID in a single query"""
+        query = """
+        SELECT user_id, full_name, role_id, department, image_path, created_at, updated_at
+        FROM users
+        WHERE user_id = ANY(%s)
+        """
+        return self.db.execute_query(query, (list(user_ids),))
+    
     def get_all_users(self):
         """Get all users"""
         query = """
@@ -2,26 +2,59 @@ import cv2
 import numpy as np
 import insightface
 from insightface.app import FaceAnalysis
+import onnxruntime
 import threading
 import queue
 import time
+import atexit
+import functools
+from image_utils import bgr_to_rgb
+
+
+def set_intra_op_threads(app, num_threads):
+    """Rebuild the ONNX Runtime sessions of a prepared FaceAnalysis with num_threads intra-op threads
+
+    insightface's model_zoo only forwards providers to the model constructors, so
+    SessionOptions passed to FaceAnalysis never reach the sessions.
+    """
+    sess_options = onnxruntime.SessionOptions()
+    sess_options.intra_op_num_threads = num_threads
+    for model in app.models.values():
+        model.session = onnxruntime.InferenceSession(
+            model.model_file,
+            sess_options=sess_options,
+            providers=model.session.get_providers(),
+        )
 
 
 class FaceEmbedder:
-    def __init__(self):
-        """Initialize the FaceEmbedder with ArcFace model running on CPU"""
+    def __init__(self, intra_op_threads=None, allowed_modules=("detection", "recognition")):
+        """Initialize the FaceEmbedder with ArcFace model running on CPU
+
+        Only the detection and recognition models are loaded by default since
+        nothing consumes the landmark or gender/age outputs; pass
+        allowed_modules=None to load the full buffalo_l pack.
+        """
         print("🔧 Initializing FaceEmbedder with CPU...")
 
         # Initialize with CPU only and specify ArcFace model
         # Use a larger detection size like in the test script to avoid tensor shape issues
-        self.app = FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"])
+        self.app = FaceAnalysis(
+            name="buffalo_l",
+            providers=["CPUExecutionProvider"],
+            allowed_modules=list(allowed_modules) if allowed_modules else None,
+        )
         self.app.prepare(ctx_id=-1, det_size=(640, 640))  # Use 640x640 like test script
+        if intra_op_threads:
+            # ONNX Runtime defaults to one intra-op thread per physical core
+            set_intra_op_threads(self.app, intra_op_threads)
 
         # Preprocessing parameters
         self.convert_to_rgb = True
         self.target_size = (112, 112)  # For recognition model
         self.expect_aligned_face = False  # Whether to expect an already aligned face
         self.skip_detection_for_aligned = True  # Skip detection for pre-aligned faces
+        self._rgb_buffer = None  # Reused RGB conversion buffer (worker thread only)
 
         # Queue for handling embeddings in a separate thread
         self.embedding_queue = queue.Queue()
@@ -35,6 +68,10 @@ class FaceEmbedder:
 
         print("✅ FaceEmbedder initialized successfully")
     
+    def warm_up(self):
+        """Run one dummy inference so ONNX Runtime finishes graph optimization up front"""
+        self.app.get(np.zeros((640, 640, 3), dtype=np.uint8))
+
     def _embedding_worker(self):
         """Worker function that runs in a separate thread to process embeddings"""
         print("🔧 Embedding worker thread started")
@@ -69,7 +106,7 @@ class FaceEmbedder:
 
             # Convert BGR to RGB (InsightFace expects RGB) - configurable
             if self.convert_to_rgb:
-                img_rgb = cv2.cvtColor(cropped_face, cv2.COLOR_BGR2RGB)
+                img_rgb = self._rgb_buffer = bgr_to_rgb(cropped_face, self._rgb_buffer)
                 print(f"🔄 Converted to RGB, shape: {img_rgb.shape}")
             else:
                 img_rgb = cropped_face
@@ -232,4 +269,20 @@ class FaceEmbedder:
         """Stop the embedding worker thread"""
         self.embedding_queue.put(None)  # Signal to stop
         if self.embedding_thread.is_alive():
-            self.embedding_thread.join()
\ No newline at end of file
+            self.embedding_thread.join()
+
+
+@functools.lru_cache(maxsize=1)
+def get_embedder():
+    """Get the process-wide FaceEmbedder, loading and warming up the models on first use"""
+    embedder = FaceEmbedder()
+    embedder.warm_up()
+    atexit.register(embedder.stop)
+    return embedder
+
+
+def __getattr__(name):
+    # `from embedder import embedder` resolves to the shared instance, created lazily
+    if name == "embedder":
+        return get_embedder()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
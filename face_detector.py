@@ -2,6 +2,7 @@ import cv2
 import numpy as np
 from abc import ABC, abstractmethod
 import os
+from image_utils import bgr_to_rgb
 
 class FaceDetector(ABC):
     """Abstract base class for face detection implementations"""
@@ -47,6 +48,7 @@ class RetinaFaceDetector(FaceDetector):
         try:
             from retinaface import RetinaFace
             self.retinaface = RetinaFace
+            self._rgb_buffer = None  # Reused RGB conversion buffer
         except ImportError:
             raise ImportError("RetinaFace not installed. Please install retinaface-package")
     
@@ -58,7 +60,7 @@ class RetinaFaceDetector(FaceDetector):
             list: List of face dictionaries with 'bbox' and 'landmarks' keys
         """
         # RetinaFace expects RGB format
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        rgb_frame = self._rgb_buffer = bgr_to_rgb(frame, self._rgb_buffer)
         faces_result = self.retinaface.detect_faces(rgb_frame)
         
         faces = []
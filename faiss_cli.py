@@ -177,6 +177,20 @@ def import_faiss_index(input_path):
     except Exception as e:
         print(f"❌ Error importing FAISS index: {e}")
 
+def rebuild_faiss_index(index_factory):
+    """Rebuild the FAISS index into a compressed index type"""
+    print(f"🔧 Rebuilding FAISS index{f' as {index_factory}' if index_factory else ''}")
+    print("=" * 40)
+
+    try:
+        if vector_db.rebuild_index(index_factory, index_path="faiss_index.bin"):
+            stats = vector_db.get_index_stats()
+            print(f"✅ FAISS index rebuilt with {stats.get('total_vectors', 0)} vectors")
+        else:
+            print("❌ Failed to rebuild FAISS index")
+    except Exception as e:
+        print(f"❌ Error rebuilding FAISS index: {e}")
+
 def view_embedding_details(faiss_id):
     """View details of a specific embedding"""
     print(f"🔍 Details for Embedding ID: {faiss_id}")
@@ -223,6 +237,10 @@ Examples:
   python faiss_cli.py remove --id 5           # Remove metadata for embedding 5
   python faiss_cli.py export index.bin        # Export FAISS index
   python faiss_cli.py import index.bin        # Import FAISS index
+  python faiss_cli.py rebuild                 # Rebuild index (IVFPQ for large galleries)
+  python faiss_cli.py rebuild --factory "IVF1024,PQ32x4fs"
+  python faiss_cli.py rebuild --factory int8  # INT8 scalar-quantized linear scan
+  python faiss_cli.py rebuild --factory hnsw  # HNSW graph over FP16 vectors
         """
     )
     
@@ -253,6 +271,10 @@ Examples:
     import_parser = subparsers.add_parser('import', help='Import FAISS index')
     import_parser.add_argument('input', help='Input file path')
     
+    # Rebuild command
+    rebuild_parser = subparsers.add_parser('rebuild', help='Rebuild FAISS index into a compressed index type')
+    rebuild_parser.add_argument('--factory', help='FAISS index_factory string or preset (fp16, int8, hnsw, fastscan) (default: chosen by gallery size)')
+    
     # Parse arguments
     args = parser.parse_args()
     
@@ -289,6 +311,9 @@ Examples:
     elif args.command == 'import':
         import_faiss_index(args.input)
         
+    elif args.command == 'rebuild':
+        rebuild_faiss_index(args.factory)
+        
     else:
         parser.print_help()
 
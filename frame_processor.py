@@ -19,6 +19,11 @@ class FrameProcessor:
         self.frame_count = 0
         self.start_time = time.time()
         self.frame_queue = queue.Queue(maxsize=1)  # Only keep the latest frame
+        self.dropped_frames = 0  # Frames replaced before the processor picked them up
+        self.queue_high_water = 0  # Highest observed frame queue depth
+        self.incoming_frame_count = 0  # Frames offered via process_frame
+        self.skip_level = 1  # Submit every Nth frame while the processor is behind
+        self.max_skip_level = 16
         self.saved_face_count = 0
 
         # Face detection and cropping parameters
@@ -148,6 +153,10 @@ class FrameProcessor:
                 # Crop and process the face with embedder
                 self._process_cropped_face(frame, x1, y1, x2, y2, timings)
 
+            # Collect the finished embeddings and recognize them together
+            if face_count:
+                self._collect_embeddings()
+
             # Add face count text
             cv2.putText(
                 annotated_frame,
@@ -201,83 +210,72 @@ class FrameProcessor:
             self.embedder.embed(cropped_face, timings)
             self.saved_face_count += 1
 
-            # Get the embedding result (non-blocking)
-            embedding, timings = self.embedder.get_embedding_result(timeout=0.01)
-            if embedding is not None:
-                print(f"✅ Generated embedding with shape: {embedding.shape}")
-
-                # If continuous scanning is enabled, perform face recognition
-                if self.continuous_scanning:
-                    self._recognize_face(embedding, timings)
-
         except Exception as e:
             print(f"Error processing cropped face: {e}")
 
-    def _recognize_face(self, embedding, timings):
-        """Recognize a face by comparing its embedding against the vector database"""
+    def _collect_embeddings(self):
+        """Drain finished embeddings and, if scanning, recognize them in one batch"""
+        # Wait briefly for the first result, then take whatever else is ready
+        embedding, timings = self.embedder.get_embedding_result(timeout=0.01)
+        if embedding is None:
+            return
+        finished = [(embedding, timings)]
+        finished.extend(
+            (emb, t) for emb, t in self.embedder.get_all_embedding_results(timeout=0)
+            if emb is not None
+        )
+
+        for embedding, _ in finished:
+            print(f"✅ Generated embedding with shape: {embedding.shape}")
+
+        # If continuous scanning is enabled, perform face recognition
+        if self.continuous_scanning:
+            self._recognize_faces(finished)
+
+    def _recognize_faces(self, finished):
+        """Recognize several faces with a single batched vector database search"""
         try:
             # Import vector_db here to avoid circular imports
             import vector_db
 
-            # Normalize the embedding
-            normalized_embedding = embedding / np.linalg.norm(embedding)
-
-            # Search for similar faces in the vector database
-            timings["search_start_time"] = time.time()
-            results = vector_db.search_embeddings(normalized_embedding, k=5)
-            timings["search_end_time"] = time.time()
-
-            if results:
-                # Find the best match below the threshold
-                best_match = None
-                for faiss_id, distance, user_id, created_at in results:
-                    if distance < self.recognition_threshold:
-                        if best_match is None or distance < best_match[1]:
-                            best_match = (user_id, distance, faiss_id)
-
-                if best_match:
-                    user_id, distance, faiss_id = best_match
-                    current_time = time.time()
-
-                    # Implement cooldown to avoid spamming the same recognition
-                    if (
-                        current_time - self.last_recognition_time
-                        > self.recognition_cooldown
-                    ):
-                        detection_duration = (
-                            timings["detection_end_time"]
-                            - timings["detection_start_time"]
-                        ) * 1000
-                        embedding_duration = (
-                            timings["embedding_end_time"]
-                            - timings["embedding_start_time"]
-                        ) * 1000
-                        search_duration = (
-                            timings["search_end_time"] - timings["search_start_time"]
-                        ) * 1000
-                        total_latency = (
-                            timings["search_end_time"] - timings["capture_time"]
-                        ) * 1000
-
-                        print(
-                            f"🎯 Face recognized! User ID: {user_id}, Distance: {distance:.4f}, FAISS ID: {faiss_id}"
-                        )
-                        print(f"   Latency Breakdown (ms):")
-                        print(f"     - Total: {total_latency:.2f}")
-                        print(f"     - Detection: {detection_duration:.2f}")
-                        print(
-                            f"     - Embedding: {embedding_duration:.2f} (includes queue time)"
-                        )
-                        print(f"     - DB Search: {search_duration:.2f}")
-                        self.last_recognition_time = current_time
-                    else:
-                        print(
-                            f"🔄 Face recognized but in cooldown period - User ID: {user_id}, Distance: {distance:.4f}"
-                        )
-                else:
-                    print("🔍 Face detected but no matches found below threshold")
-            else:
+            # Normalize all embeddings in one pass
+            embeddings = vector_db.normalize_embeddings(
+                np.stack([embedding for embedding, _ in finished])
+            )
+
+            # Search for similar faces in the vector database; metadata is only
+            # looked up for hits below the threshold
+            search_start_time = time.time()
+            batch_hits = vector_db.search_ids_batch(embeddings, k=5)
+            candidates = [
+                [(faiss_id, distance) for faiss_id, distance in hits if distance < self.recognition_threshold]
+                for hits in batch_hits
+            ]
+            metadata = vector_db.get_metadata(
+                {faiss_id for face_candidates in candidates for faiss_id, _ in face_candidates}
+            )
+            search_end_time = time.time()
+
+            if not batch_hits:
                 print("🔍 Face detected but vector database returned no results")
+                return
+
+            for (_, timings), hits, face_candidates in zip(finished, batch_hits, candidates):
+                timings["search_start_time"] = search_start_time
+                timings["search_end_time"] = search_end_time
+                # Hits are nearest first; skip vectors whose metadata is gone
+                best_match = next(
+                    ((faiss_id, distance) for faiss_id, distance in face_candidates if faiss_id in metadata),
+                    None,
+                )
+                if not hits:
+                    print("🔍 Face detected but vector database returned no results")
+                elif best_match is None:
+                    print("🔍 Face detected but no matches found below threshold")
+                else:
+                    faiss_id, distance = best_match
+                    user_id, _ = metadata[faiss_id]
+                    self._report_match(user_id, distance, faiss_id, timings)
 
         except Exception as e:
             print(f"Error during face recognition: {e}")
@@ -285,6 +283,46 @@ class FrameProcessor:
 
             traceback.print_exc()
 
+    def _report_match(self, user_id, distance, faiss_id, timings):
+        """Report a recognized face, honouring the cooldown"""
+        current_time = time.time()
+
+        # Implement cooldown to avoid spamming the same recognition
+        if (
+            current_time - self.last_recognition_time
+            > self.recognition_cooldown
+        ):
+            detection_duration = (
+                timings["detection_end_time"]
+                - timings["detection_start_time"]
+            ) * 1000
+            embedding_duration = (
+                timings["embedding_end_time"]
+                - timings["embedding_start_time"]
+            ) * 1000
+            search_duration = (
+                timings["search_end_time"] - timings["search_start_time"]
+            ) * 1000
+            total_latency = (
+                timings["search_end_time"] - timings["capture_time"]
+            ) * 1000
+
+            print(
+                f"🎯 Face recognized! User ID: {user_id}, Distance: {distance:.4f}, FAISS ID: {faiss_id}"
+            )
+            print(f"   Latency Breakdown (ms):")
+            print(f"     - Total: {total_latency:.2f}")
+            print(f"     - Detection: {detection_duration:.2f}")
+            print(
+                f"     - Embedding: {embedding_duration:.2f} (includes queue time)"
+            )
+            print(f"     - DB Search: {search_duration:.2f}")
+            self.last_recognition_time = current_time
+        else:
+            print(
+                f"🔄 Face recognized but in cooldown period - User ID: {user_id}, Distance: {distance:.4f}"
+            )
+
     def set_face_rect_color(self, color):
         """Set the color of the face detection rectangle"""
         self.face_rect_color = color
@@ -346,17 +384,30 @@ class FrameProcessor:
         if not self.processing_enabled:
             return
 
+        # Back off while the queue is saturated, recover once capacity frees up
+        if self.frame_queue.full():
+            self.skip_level = min(self.skip_level * 2, self.max_skip_level)
+        else:
+            self.skip_level = max(self.skip_level // 2, 1)
+
+        self.incoming_frame_count += 1
+        if self.incoming_frame_count % self.skip_level != 0:
+            return
+
         # Remove any existing frame in queue to avoid backlog
         try:
             self.frame_queue.get_nowait()
+            self.dropped_frames += 1
         except queue.Empty:
             pass
 
-        # Add the new frame
+        # Add the new frame. Copy it since stream frames live in a ring buffer
+        # that the capture thread overwrites while detection is still running.
         try:
-            self.frame_queue.put_nowait((frame, timings))
+            self.frame_queue.put_nowait((frame.copy(), timings))
         except queue.Full:
-            pass
+            self.dropped_frames += 1
+        self.queue_high_water = max(self.queue_high_water, self.frame_queue.qsize())
 
     def get_processed_frame(self):
         """Get the latest processed frame"""
@@ -367,6 +418,15 @@ class FrameProcessor:
                 else None
             )
 
+    def get_queue_stats(self):
+        """Get the frame queue depth, high-water mark, drop count and skip level"""
+        return {
+            "depth": self.frame_queue.qsize(),
+            "high_water": self.queue_high_water,
+            "drops": self.dropped_frames,
+            "skip_level": self.skip_level,
+        }
+
     def get_fps(self):
         elapsed_time = time.time() - self.start_time
         return self.frame_count / elapsed_time if elapsed_time > 0 else 0
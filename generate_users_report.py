@@ -9,7 +9,7 @@ import base64
 import cv2
 
 # Initialize FAISS index to get proper stats
-vector_db.init_index(dim=512, index_path="faiss_index.bin")
+vector_db.init_index(dim=512, index_path="faiss_index.bin", mmap=True, defer_schema=True)
 print("🔧 FAISS Vector Database initialized for reporting")
 
 def generate_users_report():
@@ -144,15 +144,18 @@ def generate_simple_html(report_data):
             image_html = "No Image"
             if user['image_path'] and os.path.exists(user['image_path']):
                 try:
-                    img = cv2.imread(user['image_path'])
-                    # Resize image to a standard height
+                    # Decode at 1/4 scale unless that is smaller than the thumbnail
                     height = 100
+                    img = cv2.imread(user['image_path'], cv2.IMREAD_REDUCED_COLOR_4)
+                    if img is None or img.shape[0] < height:
+                        img = cv2.imread(user['image_path'])
+                    # Resize image to a standard height
                     aspect_ratio = img.shape[1] / img.shape[0]
                     width = int(height * aspect_ratio)
                     resized_img = cv2.resize(img, (width, height))
                     
                     # Encode image to base64
-                    _, buffer = cv2.imencode('.jpg', resized_img)
+                    _, buffer = cv2.imencode('.jpg', resized_img, [cv2.IMWRITE_JPEG_QUALITY, 70])
                     img_base64 = base64.b64encode(buffer).decode('utf-8')
                     image_html = f'<img src="data:image/jpeg;base64,{img_base64}" alt="User Image">'
                 except Exception as e:
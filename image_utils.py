@@ -0,0 +1,19 @@
+import cv2
+import numpy as np
+
+
+def bgr_to_rgb(frame, buffer=None):
+    """
+    Convert a BGR image to RGB, writing into a reusable buffer.
+
+    Args:
+        frame (numpy.ndarray): BGR image
+        buffer (numpy.ndarray, optional): Buffer from a previous call. It is reused
+            when its shape matches the frame, otherwise a new one is allocated.
+
+    Returns:
+        numpy.ndarray: The RGB image (the buffer to pass to the next call)
+    """
+    if buffer is None or buffer.shape != frame.shape or buffer.dtype != frame.dtype:
+        buffer = np.empty_like(frame)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=buffer)
@@ -1,22 +1,58 @@
 import cv2
+import os
 import time
 import queue
 import threading
+import itertools
 from stream import VideoStream
 from frame_processor import FrameProcessor
 from ui_controller import UIController
-from embedder import FaceEmbedder
+from embedder import get_embedder
 import numpy as np
-from camera_detector import detect_cameras
+from camera_detector import cached_cameras
 
-# Import and initialize vector database
 import vector_db
-vector_db.init_index(dim=512, index_path="faiss_index.bin")
-print("🔧 FAISS Vector Database initialized")
 
+# Feature flags for the entry point (override via environment variables)
+WITH_VECTOR_DB = os.getenv("SECUREFACE_VECTOR_DB", "1") != "0"
+DETECT_CAMERAS = os.getenv("SECUREFACE_DETECT_CAMERAS", "1") != "0"
 
-def handle_system_controls(config, processor, processing_enabled):
-    """Handle system control configurations"""
+USE_OPENCL = os.getenv("SECUREFACE_OPENCL", "0") == "1"
+
+# Seconds camera settings must stay unchanged before the stream is restarted
+CAMERA_RESTART_DEBOUNCE = 0.2
+
+
+# Preallocated scratch framebuffers for blank placeholder frames. Buffers are
+# recycled round-robin, so at most SCRATCH_POOL_SIZE may be in use at once.
+SCRATCH_POOL_SIZE = 4
+SCRATCH_POOL = [np.zeros((480, 640, 3), dtype=np.uint8) for _ in range(SCRATCH_POOL_SIZE)]
+scratch_idx = itertools.cycle(range(SCRATCH_POOL_SIZE))
+
+
+def get_scratch_frame(height=480, width=640):
+    """Get a zeroed scratch frame, reusing a pooled buffer when the size matches"""
+    if (height, width) != SCRATCH_POOL[0].shape[:2]:
+        return np.zeros((height, width, 3), dtype=np.uint8)
+    buf = SCRATCH_POOL[next(scratch_idx)]
+    buf.fill(0)
+    return buf
+
+
+def configure_opencv():
+    """Enable OpenCV SIMD paths and cap its thread pool to leave cores for our own threads"""
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(max(1, (os.cpu_count() or 2) // 2))
+    if USE_OPENCL and cv2.ocl.haveOpenCL():
+        cv2.ocl.setUseOpenCL(True)
+    print(
+        f"⚙️ OpenCV optimized: {cv2.useOptimized()}, threads: {cv2.getNumThreads()}, "
+        f"OpenCL: {cv2.ocl.useOpenCL()}"
+    )
+
+
+def handle_system_controls(config, processor, processing_enabled, camera_streaming, processing_active):
+    """Handle system control configurations (keys missing from a partial config keep their state)"""
     updated_processing_enabled = processing_enabled
     
     # Handle processing enabled toggle
@@ -25,13 +61,13 @@ def handle_system_controls(config, processor, processing_enabled):
         processor.toggle_processing(updated_processing_enabled)
 
     # Handle camera streaming control
-    camera_streaming = config.get("camera_streaming", True)
+    camera_streaming = config.get("camera_streaming", camera_streaming)
 
     # Handle processing active control
-    processing_active = config.get("processing_active", True)
+    processing_active = config.get("processing_active", processing_active)
     
     # Only update processing if it's not globally disabled
-    if "processing_enabled" in config and updated_processing_enabled:
+    if ("processing_enabled" in config or "processing_active" in config) and updated_processing_enabled:
         processor.toggle_processing(processing_active)
         
     return updated_processing_enabled, camera_streaming, processing_active
@@ -86,9 +122,11 @@ def handle_preprocessing_params(config, embedder):
         except Exception as e:
             print(f"Warning: Could not set convert to RGB: {e}")
         
-    if 'target_width' in config and 'target_height' in config:
+    if 'target_width' in config or 'target_height' in config:
         try:
-            embedder.set_target_size(config['target_width'], config['target_height'])
+            width, height = embedder.target_size
+            embedder.set_target_size(
+                config.get('target_width', width), config.get('target_height', height))
         except Exception as e:
             print(f"Warning: Could not set target size: {e}")
 
@@ -188,39 +226,81 @@ def handle_frame_capture(config, stream, ui_controller, camera_streaming):
                 print("⏰ Timeout waiting for new frame - giving up")
 
 
-def handle_camera_settings(config, stream, ui_controller):
-    """Handle camera settings changes"""
-    # If camera settings changed, restart stream
+def handle_camera_settings(config, stream, pending_camera):
+    """Stash camera settings changes so the stream restart can be debounced"""
+    if not any(key in config for key in ("camera_source", "width", "height", "fps")):
+        return
+
+    # Partial configs only carry changed keys; fill the rest from the running stream
+    camera_config = {
+        "camera_source": int(config.get("camera_source", stream.src)),
+        "width": config.get("width", stream.width),
+        "height": config.get("height", stream.height),
+        "fps": config.get("fps", stream.fps),
+    }
+
+    # Settings match the running stream - drop any pending restart
     if (
-        "camera_source" in config
-        and "width" in config
-        and "height" in config
-        and "fps" in config
-        and (
-            config["camera_source"] != stream.src
-            or config["width"] != stream.width
-            or config["height"] != stream.height
-            or config["fps"] != stream.fps
-        )
+        camera_config["camera_source"] == stream.src
+        and camera_config["width"] == stream.width
+        and camera_config["height"] == stream.height
+        and camera_config["fps"] == stream.fps
     ):
-        # Stop current stream
-        stream.stop()
+        pending_camera.clear()
+        return
+
+    # Restart the debounce timer only when the requested settings change
+    if pending_camera.get("config") != camera_config:
+        pending_camera["config"] = camera_config
+        pending_camera["since"] = time.time()
 
-        # Start new stream with updated settings
-        stream = VideoStream(
-            src=int(config["camera_source"]),
-            width=config["width"],
-            height=config["height"],
-            fps=config["fps"],
-        ).start()
 
-        ui_controller.update_status("Camera settings updated")
+def apply_pending_camera_settings(stream, ui_controller, pending_camera):
+    """Restart the stream once pending camera settings have been stable long enough"""
+    if "config" not in pending_camera:
         return stream
+    if time.time() - pending_camera["since"] < CAMERA_RESTART_DEBOUNCE:
+        return stream
+
+    camera_config = pending_camera["config"]
+    pending_camera.clear()
+
+    # Stop current stream
+    stream.stop()
+
+    # Start new stream with updated settings
+    stream = VideoStream(
+        src=camera_config["camera_source"],
+        width=camera_config["width"],
+        height=camera_config["height"],
+        fps=camera_config["fps"],
+    ).start()
+
+    ui_controller.update_status("Camera settings updated")
     return stream
 
 
+def make_paused_frame(frame, text, size=(480, 640)):
+    """Snapshot a frame (or a blank one if none is available) with a pause badge"""
+    if frame is None:
+        # Paused frames are cached by the caller, so they can't borrow a recycled scratch buffer
+        paused = np.zeros((size[0], size[1], 3), dtype=np.uint8)
+    else:
+        paused = frame.copy()
+    cv2.putText(
+        paused,
+        text,
+        (paused.shape[1] // 2 - 120, paused.shape[0] // 2),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1,
+        (255, 255, 255),
+        2,
+    )
+    return paused
+
+
 def process_frame_data(camera_streaming, stream, processing_enabled, processing_active, 
-                      processor, ui_controller):
+                      processor, ui_controller, display_cache):
     """Process frame data and display results"""
     # Only process if there's a new frame and camera streaming is enabled
     if camera_streaming and stream.has_new_frame():
@@ -230,59 +310,42 @@ def process_frame_data(camera_streaming, stream, processing_enabled, processing_
             print("Failed to get frame from camera")
             return False, None
 
+        # Camera is live again - drop the paused snapshots
+        display_cache["last_original"] = frame
+        display_cache["camera_paused_original"] = None
+        display_cache["camera_paused_processed"] = None
+
         # Display original frame
         cv2.imshow("Original Feed", frame)
 
         # Submit for processing only if processing is enabled and active
         if processing_enabled and processing_active:
             processor.process_frame(frame, timings)
+            display_cache["processing_paused"] = None
 
         # Get and display processed frame if available
         processed = processor.get_processed_frame()
         if processed is not None and processing_enabled and processing_active:
             cv2.imshow("Processed Feed", processed)
         elif not processing_active and processing_enabled:
-            # Show blank frame when processing is paused but enabled
-            blank = np.zeros(
-                (frame.shape[0], frame.shape[1], 3), dtype=np.uint8
-            )
-            cv2.putText(
-                blank,
-                "Processing Paused",
-                (blank.shape[1] // 2 - 120, blank.shape[0] // 2),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                1,
-                (255, 255, 255),
-                2,
-            )
-            cv2.imshow("Processed Feed", blank)
+            # Freeze the last processed frame with a badge when processing is paused
+            if display_cache.get("processing_paused") is None:
+                display_cache["processing_paused"] = make_paused_frame(
+                    processed, "Processing Paused", frame.shape[:2]
+                )
+            cv2.imshow("Processed Feed", display_cache["processing_paused"])
         return True, frame
     elif not camera_streaming:
-        # Show blank frame when camera streaming is paused
-        blank = np.zeros((480, 640, 3), dtype=np.uint8)
-        cv2.putText(
-            blank,
-            "Camera Paused",
-            (blank.shape[1] // 2 - 120, blank.shape[0] // 2),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1,
-            (255, 255, 255),
-            2,
-        )
-        cv2.imshow("Original Feed", blank)
-
-        # Also show blank for processed feed
-        blank2 = np.zeros((480, 640, 3), dtype=np.uint8)
-        cv2.putText(
-            blank2,
-            "Camera Paused",
-            (blank2.shape[1] // 2 - 120, blank2.shape[0] // 2),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1,
-            (255, 255, 255),
-            2,
-        )
-        cv2.imshow("Processed Feed", blank2)
+        # Freeze the last frames with a badge when camera streaming is paused
+        if display_cache.get("camera_paused_original") is None:
+            display_cache["camera_paused_original"] = make_paused_frame(
+                display_cache.get("last_original"), "Camera Paused"
+            )
+            display_cache["camera_paused_processed"] = make_paused_frame(
+                processor.get_processed_frame(), "Camera Paused"
+            )
+        cv2.imshow("Original Feed", display_cache["camera_paused_original"])
+        cv2.imshow("Processed Feed", display_cache["camera_paused_processed"])
 
         # Small delay to prevent excessive CPU usage when camera is paused
         time.sleep(0.01)
@@ -293,6 +356,17 @@ def process_frame_data(camera_streaming, stream, processing_enabled, processing_
         return True, None
 
 
+def update_metrics(metrics, stream, processor):
+    """Refresh the shared metrics dict with the current stream and processor stats"""
+    queue_stats = processor.get_queue_stats()
+    metrics["cap_fps"] = stream.get_fps()
+    metrics["proc_fps"] = processor.get_fps()
+    metrics["in_q_depth"] = queue_stats["depth"]
+    metrics["in_q_high_water"] = queue_stats["high_water"]
+    metrics["drops"] = queue_stats["drops"]
+    metrics["skip"] = queue_stats["skip_level"]
+
+
 def handle_keyboard_input(key, processing_enabled, processor):
     """Handle keyboard input for processing toggle"""
     if key == ord("p"):
@@ -303,7 +377,7 @@ def handle_keyboard_input(key, processing_enabled, processor):
 
         if not processing_enabled:
             # Show blank frame when processing is disabled
-            blank = np.zeros((480, 640, 3), dtype=np.uint8)
+            blank = get_scratch_frame()
             cv2.putText(
                 blank,
                 "Processing Disabled",
@@ -317,18 +391,18 @@ def handle_keyboard_input(key, processing_enabled, processor):
     return processing_enabled
 
 
-def main():
-    # Create a queue for configuration updates
-    config_queue = queue.Queue()
-
-    # Initialize UI controller
-    ui_controller = UIController(config_queue)
-    ui_controller.start()
+def run_pipeline(config_queue, ui_controller, detect_camera, stop_event):
+    """
+    Run the camera and processing pipeline until 'q' is pressed or stop_event is set.
 
+    Runs on a worker thread; the Tk control panel owns the main thread and is
+    only talked to through its thread-safe update_status/set_metrics/
+    set_captured_frame methods.
+    """
     # Initialize video stream with better defaults
     try:
         # Use the first available camera
-        available_cameras = detect_cameras()
+        available_cameras = cached_cameras() if detect_camera else []
         camera_source = available_cameras[0] if available_cameras else 0
         stream = VideoStream(src=camera_source, width=640, height=480, fps=60).start()
     except RuntimeError as e:
@@ -336,8 +410,8 @@ def main():
         ui_controller.stop()
         return
 
-    # Initialize the embedder
-    embedder = FaceEmbedder()
+    # Share the process-wide, warmed-up embedder with user registration
+    embedder = get_embedder()
     
     # Initialize the frame processor
     # Default to RetinaFace for backward compatibility
@@ -348,14 +422,17 @@ def main():
     cv2.namedWindow("Original Feed", cv2.WINDOW_NORMAL)
     cv2.namedWindow("Processed Feed", cv2.WINDOW_NORMAL)
 
-    last_fps_print = time.time()
+    last_metrics_update = time.time()
+    metrics = {"cap_fps": 0.0, "proc_fps": 0.0, "in_q_depth": 0, "in_q_high_water": 0, "drops": 0, "skip": 1}
     processing_enabled = True
     camera_streaming = True
     processing_active = True
     last_config_check = time.time()
+    pending_camera = {}
+    display_cache = {}
 
     try:
-        while True:
+        while not stop_event.is_set():
             # Check for configuration updates every 100ms
             if time.time() - last_config_check >= 0.1:
                 try:
@@ -366,7 +443,7 @@ def main():
                     
                     # Handle system controls
                     processing_enabled, camera_streaming, processing_active = handle_system_controls(
-                        config, processor, processing_enabled)
+                        config, processor, processing_enabled, camera_streaming, processing_active)
                     
                     # Handle face detection parameters
                     handle_face_detection_params(config, processor)
@@ -383,25 +460,32 @@ def main():
                     # Handle frame capture request for user registration
                     handle_frame_capture(config, stream, ui_controller, camera_streaming)
                     
-                    # Handle camera settings changes
-                    stream = handle_camera_settings(config, stream, ui_controller)
+                    # Handle camera settings changes (restart is debounced)
+                    handle_camera_settings(config, stream, pending_camera)
+
+                    # Let the control panel accept the next Apply
+                    ui_controller.config_applied()
 
                 except queue.Empty:
                     pass
+
+                # Restart the stream once pending camera settings have settled
+                stream = apply_pending_camera_settings(stream, ui_controller, pending_camera)
                 last_config_check = time.time()
 
             # Process frame data
             ret, frame = process_frame_data(
                 camera_streaming, stream, processing_enabled, processing_active, 
-                processor, ui_controller)
+                processor, ui_controller, display_cache)
             
             if not ret:
                 break
 
-            # Print FPS every second
-            if time.time() - last_fps_print >= 1.0:
-                # print(f"Camera FPS: {stream.get_fps():.1f}, Processing FPS: {processor.get_fps():.1f}")
-                last_fps_print = time.time()
+            # Publish metrics to the UI every second
+            if time.time() - last_metrics_update >= 1.0:
+                update_metrics(metrics, stream, processor)
+                ui_controller.set_metrics(metrics)
+                last_metrics_update = time.time()
 
             # Check for 'q' key to quit
             key = cv2.waitKey(1) & 0xFF
@@ -411,8 +495,6 @@ def main():
             # Handle keyboard input for processing toggle
             processing_enabled = handle_keyboard_input(key, processing_enabled, processor)
 
-    except KeyboardInterrupt:
-        print("\nStopping gracefully...")
     except Exception as e:
         print(f"Error: {e}")
     finally:
@@ -423,5 +505,53 @@ def main():
         cv2.destroyAllWindows()
 
 
+def main(with_vector_db=WITH_VECTOR_DB, detect_camera=DETECT_CAMERAS):
+    """
+    Run the SecureFace application.
+
+    Args:
+        with_vector_db (bool): Initialize the FAISS vector database for recognition
+        detect_camera (bool): Probe for available cameras instead of using index 0
+    """
+    configure_opencv()
+
+    if with_vector_db:
+        vector_db.init_index(dim=512, index_path="faiss_index.bin")
+        print("🔧 FAISS Vector Database initialized")
+
+    # Create a queue for configuration updates (UI posts keep only the latest).
+    # SimpleQueue has no task_done/join; consumers only use get_nowait()
+    config_queue = queue.SimpleQueue()
+
+    # Initialize UI controller; widgets are built before the pipeline starts posting to them
+    ui_controller = UIController(config_queue)
+    ui_controller.init()
+
+    # Run the camera/processing pipeline on a worker thread so Tk owns the main thread
+    stop_event = threading.Event()
+    pipeline = threading.Thread(
+        target=run_pipeline,
+        args=(config_queue, ui_controller, detect_camera, stop_event),
+        daemon=True,
+    )
+    pipeline.start()
+
+    try:
+        # Blocks in the Tk main loop until the control panel closes
+        ui_controller.run()
+
+        # The video windows keep running after the control panel is closed
+        while pipeline.is_alive():
+            pipeline.join(0.5)
+    except KeyboardInterrupt:
+        print("\nStopping gracefully...")
+        stop_event.set()
+        pipeline.join()
+    finally:
+        if with_vector_db:
+            # Write out registrations whose deferred index flush has not fired yet
+            vector_db.flush()
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
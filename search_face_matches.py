@@ -7,37 +7,35 @@ import argparse
 import numpy as np
 from datetime import datetime
 import base64
-from embedder import FaceEmbedder
+import functools
+from embedder import get_embedder
 import vector_db
 from database.db import SecureFaceDB
 
 def normalize_embedding(embedding):
     """Normalize embedding to unit length"""
-    norm = np.linalg.norm(embedding)
-    if norm > 0:
-        return embedding / norm
-    return embedding
+    return vector_db.normalize_embeddings(embedding.reshape(1, -1))[0]
 
 def load_and_embed_image(image_path):
-    """Load an image and generate its embedding"""
+    """Load an image and generate its embedding, returning (embedding, frame)"""
     print(f"🔍 Loading and embedding image: {image_path}")
     
     # Check if file exists
     if not os.path.exists(image_path):
         print(f"❌ File not found: {image_path}")
-        return None
+        return None, None
         
     # Load the image
     print("📥 Loading image...")
     frame = cv2.imread(image_path)
     if frame is None:
         print(f"❌ Failed to load image: {image_path}")
-        return None
+        return None, None
         
     print(f"✅ Image loaded successfully - shape: {frame.shape}")
     
-    # Initialize the embedder
-    embedder = FaceEmbedder()
+    # Get the shared embedder
+    embedder = get_embedder()
     
     # Generate embedding
     print("🧠 Generating embedding...")
@@ -57,26 +55,25 @@ def load_and_embed_image(image_path):
             # Normalize the embedding for better similarity matching
             normalized_embedding = normalize_embedding(embedding)
             print(f"📏 Normalized embedding norm: {np.linalg.norm(normalized_embedding)}")
-            return normalized_embedding
+            return normalized_embedding, frame
         else:
             print("⚠️ No faces detected in the image")
-            return None
+            return None, frame
             
     except Exception as e:
         print(f"❌ Error generating embedding: {e}")
         import traceback
         traceback.print_exc()
-        return None
-    finally:
-        # Clean up embedder
-        embedder.stop()
+        return None, frame
 
 def search_similar_faces(embedding, k=5):
     """Search for similar faces in the vector database"""
     print(f"🔍 Searching for similar faces...")
     
     # Initialize FAISS index
-    vector_db.init_index(dim=512, index_path="faiss_index.bin")
+    vector_db.init_index(dim=512, index_path="faiss_index.bin", mmap=True, defer_schema=True)
+    vector_db.set_nprobe(16)
+    vector_db.set_num_threads(os.cpu_count() or 1)
     
     # Normalize the query embedding
     normalized_embedding = normalize_embedding(embedding)
@@ -92,114 +89,143 @@ def search_similar_faces(embedding, k=5):
         print("⚠️ No similar faces found")
         return []
 
-def get_user_info(user_id):
-    """Get user information from the database"""
+def get_users_info(user_ids):
+    """Get user information for several users with one query, keyed by user ID"""
+    user_ids = {int(user_id) for user_id in user_ids}
+    if not user_ids:
+        return {}
     try:
         with SecureFaceDB() as db:
-            user = db.get_user_by_id(user_id)
-            return user
+            users = db.get_users_by_ids(user_ids) or []
+        return {user["user_id"]: user for user in users}
     except Exception as e:
-        print(f"❌ Error fetching user info for ID {user_id}: {e}")
-        return None
+        print(f"❌ Error fetching user info for IDs {sorted(user_ids)}: {e}")
+        return {}
+
+# Stored JPEGs below this size skip the decode/resize/re-encode round trip
+RAW_JPEG_MAX_BYTES = 50_000
+JPEG_MAGIC = b"\xff\xd8\xff"
 
+@functools.lru_cache(maxsize=256)
 def encode_image_to_base64(image_path):
     """Encode an image to base64 for embedding in HTML"""
     try:
         if not os.path.exists(image_path):
             return None
             
-        img = cv2.imread(image_path)
+        # Small JPEGs are embedded as-is; the <img> max-height scales them for display
+        if os.path.getsize(image_path) < RAW_JPEG_MAX_BYTES:
+            with open(image_path, 'rb') as f:
+                data = f.read()
+            if data[:3] == JPEG_MAGIC:
+                return base64.b64encode(data).decode('utf-8')
+            
+        # Let libjpeg decode directly at 1/4 scale, falling back to a full
+        # decode when the reduced image would be smaller than the thumbnail
+        height = 100
+        img = cv2.imread(image_path, cv2.IMREAD_REDUCED_COLOR_4)
+        if img is None or img.shape[0] < height:
+            img = cv2.imread(image_path)
         if img is None:
             return None
             
+        return encode_frame_to_base64(img, height)
+    except Exception as e:
+        print(f"❌ Error encoding image {image_path}: {e}")
+        return None
+
+def encode_frame_to_base64(frame, height=100):
+    """Encode an already-decoded image to a base64 JPEG thumbnail for embedding in HTML"""
+    try:
         # Resize image to a standard height for display
-        height = 100
-        aspect_ratio = img.shape[1] / img.shape[0]
+        aspect_ratio = frame.shape[1] / frame.shape[0]
         width = int(height * aspect_ratio)
-        resized_img = cv2.resize(img, (width, height))
-        
+        resized_img = cv2.resize(frame, (width, height))
+    
         # Encode image to base64
-        _, buffer = cv2.imencode('.jpg', resized_img)
+        _, buffer = cv2.imencode('.jpg', resized_img, [cv2.IMWRITE_JPEG_QUALITY, 70])
         img_base64 = base64.b64encode(buffer).decode('utf-8')
         return img_base64
     except Exception as e:
-        print(f"❌ Error encoding image {image_path}: {e}")
+        print(f"❌ Error encoding image: {e}")
         return None
 
-def generate_html_report(query_image_path, results, output_path="face_search_results.html"):
+def generate_html_report(query_frame, results, output_path="face_search_results.html"):
     """Generate an HTML report with the search results"""
     print(f"📊 Generating HTML report: {output_path}")
     
-    # Read the query image and encode it
-    query_image_base64 = encode_image_to_base64(query_image_path)
+    # Encode the already-decoded query image
+    query_image_base64 = encode_frame_to_base64(query_frame)
     
     # Format the current time
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    html_lines = [
-        "<!DOCTYPE html>",
-        "<html>",
-        "<head>",
-        "    <title>SecureFace - Face Search Results</title>",
-        '    <meta charset="UTF-8">',
-        "</head>",
-        "<body>",
-        "    <h1>SecureFace Face Search Results</h1>",
-        f"    <p>Generated at: {current_time}</p>",
-        "    ",
-        "    <h2>Query Image</h2>"
-    ]
-    
     if query_image_base64:
-        html_lines.append(f'    <img src="data:image/jpeg;base64,{query_image_base64}" alt="Query Image" style="max-width: 300px;">')
+        query_image_html = f'    <img src="data:image/jpeg;base64,{query_image_base64}" alt="Query Image" style="max-width: 300px;">'
     else:
-        html_lines.append("    <p>Error loading query image</p>")
+        query_image_html = "    <p>Error loading query image</p>"
     
-    html_lines.append("    ")
-    html_lines.append("    <h2>Search Results</h2>")
+    # Fetch all matched users in one round-trip before the file is opened
+    users = get_users_info(user_id for _, _, user_id, _ in results) if results else {}
     
-    if not results:
-        html_lines.append("    <p>No matching faces found in the database</p>")
-    else:
-        html_lines.append("    <table border='1' cellpadding='5' cellspacing='0'>")
-        html_lines.append("        <tr><th>Rank</th><th>Match Image</th><th>User ID</th><th>User Name</th><th>Department</th><th>Distance</th><th>Registered At</th></tr>")
-        
-        for i, (faiss_id, distance, user_id, created_at) in enumerate(results, 1):
-            # Get user information
-            user = get_user_info(user_id)
-            user_name = user['full_name'] if user and user['full_name'] else "N/A"
-            department = user['department'] if user and user['department'] else "N/A"
-            image_path = user['image_path'] if user and user['image_path'] else None
-            
-            # Encode user image if available
-            user_image_html = "No Image"
-            if image_path and os.path.exists(image_path):
-                user_image_base64 = encode_image_to_base64(image_path)
-                if user_image_base64:
-                    user_image_html = f'<img src="data:image/jpeg;base64,{user_image_base64}" alt="User Image" style="max-height: 100px;">'
-            
-            html_lines.append("        <tr>")
-            html_lines.append(f"            <td>{i}</td>")
-            html_lines.append(f"            <td>{user_image_html}</td>")
-            html_lines.append(f"            <td>{user_id}</td>")
-            html_lines.append(f"            <td>{user_name}</td>")
-            html_lines.append(f"            <td>{department}</td>")
-            html_lines.append(f"            <td>{distance:.4f}</td>")
-            html_lines.append(f"            <td>{created_at.strftime('%Y-%m-%d %H:%M:%S') if created_at else 'N/A'}</td>")
-            html_lines.append("        </tr>")
-        
-        html_lines.append("    </table>")
+    # Stream the HTML straight to the file instead of building it in memory
+    try:
+        with open(output_path, "w", buffering=1 << 20) as f:
+            f.write(
+                "<!DOCTYPE html>\n"
+                "<html>\n"
+                "<head>\n"
+                "    <title>SecureFace - Face Search Results</title>\n"
+                '    <meta charset="UTF-8">\n'
+                "</head>\n"
+                "<body>\n"
+                "    <h1>SecureFace Face Search Results</h1>\n"
+                f"    <p>Generated at: {current_time}</p>\n"
+                "    \n"
+                "    <h2>Query Image</h2>\n"
+                f"{query_image_html}\n"
+                "    \n"
+                "    <h2>Search Results</h2>\n"
+            )
     
-    html_lines.append("</body>")
-    html_lines.append("</html>")
+            if not results:
+                f.write("    <p>No matching faces found in the database</p>\n")
+            else:
+                f.write(
+                    "    <table border='1' cellpadding='5' cellspacing='0'>\n"
+                    "        <tr><th>Rank</th><th>Match Image</th><th>User ID</th><th>User Name</th><th>Department</th><th>Distance</th><th>Registered At</th></tr>\n"
+                )
     
-    # Join all HTML lines
-    html_content = "\n".join(html_lines)
+                for i, (faiss_id, distance, user_id, created_at) in enumerate(results, 1):
+                    # Get user information
+                    user = users.get(user_id)
+                    user_name = user['full_name'] if user and user['full_name'] else "N/A"
+                    department = user['department'] if user and user['department'] else "N/A"
+                    image_path = user['image_path'] if user and user['image_path'] else None
     
-    # Write HTML to file
-    try:
-        with open(output_path, "w") as f:
-            f.write(html_content)
+                    # Encode user image if available
+                    user_image_html = "No Image"
+                    if image_path and os.path.exists(image_path):
+                        user_image_base64 = encode_image_to_base64(image_path)
+                        if user_image_base64:
+                            user_image_html = f'<img src="data:image/jpeg;base64,{user_image_base64}" alt="User Image" style="max-height: 100px;">'
+    
+                    registered_at = created_at.strftime("%Y-%m-%d %H:%M:%S") if created_at else "N/A"
+                    f.write(
+                        "        <tr>\n"
+                        f"            <td>{i}</td>\n"
+                        f"            <td>{user_image_html}</td>\n"
+                        f"            <td>{user_id}</td>\n"
+                        f"            <td>{user_name}</td>\n"
+                        f"            <td>{department}</td>\n"
+                        f"            <td>{distance:.4f}</td>\n"
+                        f"            <td>{registered_at}</td>\n"
+                        "        </tr>\n"
+                    )
+    
+                f.write("    </table>\n")
+    
+            f.write("</body>\n</html>")
         print(f"✅ HTML report generated: {output_path}")
         return True
     except Exception as e:
@@ -235,7 +261,7 @@ Examples:
         sys.exit(1)
     
     # Load and embed the image
-    embedding = load_and_embed_image(args.image_path)
+    embedding, frame = load_and_embed_image(args.image_path)
     if embedding is None:
         print("❌ Failed to generate embedding for the image")
         sys.exit(1)
@@ -244,7 +270,7 @@ Examples:
     results = search_similar_faces(embedding, k=args.top_k)
     
     # Generate HTML report
-    success = generate_html_report(args.image_path, results, args.output)
+    success = generate_html_report(frame, results, args.output)
     
     if success:
         print(f"\n✅ Face search completed! Results saved to {args.output}")
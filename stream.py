@@ -1,38 +1,58 @@
 import cv2
+import sys
 import threading
 import time
 import numpy as np
+from camera_detector import enumerate_v4l2_devices
 
-def list_cameras(max_cams=5):
+def list_cameras(max_cams=2):
     available = []
-    for i in range(max_cams):
-        try:
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                ret, frame = cap.read()
-                if ret:
+    if sys.platform.startswith("linux"):
+        # Only probe indices that have a device node, and skip the frame read
+        for i in enumerate_v4l2_devices():
+            try:
+                cap = cv2.VideoCapture(i, cv2.CAP_V4L2)
+                if cap.isOpened():
                     available.append(f"Camera {i}")
                 cap.release()
-        except Exception as e:
-            print(f"Error checking camera {i}: {e}")
+            except Exception as e:
+                print(f"Error checking camera {i}: {e}")
+    else:
+        for i in range(max_cams):
+            try:
+                cap = cv2.VideoCapture(i)
+                if cap.isOpened():
+                    ret, frame = cap.read()
+                    if ret:
+                        available.append(f"Camera {i}")
+                    cap.release()
+            except Exception as e:
+                print(f"Error checking camera {i}: {e}")
     if not available:
         print("No cameras found. Please check your camera connections.")
     return available
 
 class VideoStream:
-    def __init__(self, src=0, width=640, height=480, fps=30):
+    def __init__(self, src=0, width=640, height=480, fps=30, buffer_size=8):
         self.src = src
         self.width = width
         self.height = height
         self.fps = fps
         
         self.cap = None
-        self.frame = None
         self.stopped = False
-        self.lock = threading.Lock()
         self.frame_count = 0
         self.start_time = time.time()
-        self.new_frame = False
+
+        # Ring of preallocated frames written by the capture thread. Frames returned
+        # by read() are views into the ring and stay valid for buffer_size - 1
+        # further captures; copy them if they must be kept longer.
+        self.buffer_size = buffer_size
+        self._ring = None
+        self._times = np.zeros(buffer_size)
+        self._latest_idx = -1
+        self._write_seq = 0  # Number of frames published by the capture thread
+        self._read_seq = 0  # Value of _write_seq at the last read()
 
     def start(self):
         self.stopped = False
@@ -48,34 +68,46 @@ class VideoStream:
         ret, frame = self.cap.read()
         if not ret:
             raise RuntimeError("Failed to read initial frame")
-        
-        with self.lock:
-            self.frame = (frame, {'capture_time': time.time()})
-            self.new_frame = True
+
+        # Size the ring from the actual frame shape, the camera may not honor the request
+        self._ring = np.empty((self.buffer_size,) + frame.shape, dtype=np.uint8)
+        self._ring[0] = frame
+        self._publish(0)
             
         threading.Thread(target=self._update, daemon=True).start()
         return self
 
+    def _publish(self, idx):
+        """Make the frame in ring slot idx the latest one (single writer)"""
+        self._times[idx] = time.time()
+        self._latest_idx = idx
+        self._write_seq += 1
+
     def _update(self):
+        idx = self._latest_idx
         while not self.stopped:
-            ret, frame = self.cap.read()
+            idx = (idx + 1) % self.buffer_size
+            if not self.cap.grab():
+                break
+            ret, frame = self.cap.retrieve(self._ring[idx])
             if not ret:
                 break
-            with self.lock:
-                self.frame = (frame, {'capture_time': time.time()})
-                self.new_frame = True
-                self.frame_count += 1
+            if frame.shape != self._ring[idx].shape:
+                # Resolution changed under us, fall back to copying into the slot
+                frame = cv2.resize(frame, (self._ring.shape[2], self._ring.shape[1]))
+                self._ring[idx] = frame
+            self._publish(idx)
+            self.frame_count += 1
 
     def read(self):
-        with self.lock:
-            if self.frame is not None:
-                self.new_frame = False
-                return True, self.frame[0], self.frame[1]
+        idx = self._latest_idx
+        if idx < 0:
             return False, None, None
+        self._read_seq = self._write_seq
+        return True, self._ring[idx], {'capture_time': float(self._times[idx])}
             
     def has_new_frame(self):
-        with self.lock:
-            return self.new_frame
+        return self._write_seq != self._read_seq
 
     def stop(self):
         self.stopped = True
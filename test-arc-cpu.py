@@ -3,12 +3,22 @@ import numpy as np
 import insightface
 from insightface.app import FaceAnalysis
 import os
-from glob import glob
 import argparse  # To handle command line arguments
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import onnxruntime
+from insightface.utils import face_align
+
+try:
+    import numba
+except ImportError:
+    numba = None  # Optional: falls back to the NumPy/BLAS distance path
 
 # --- Import and initialize vector database ---
 import vector_db
+from image_utils import bgr_to_rgb
+from embedder import get_embedder, set_intra_op_threads
 
 # Initialize FAISS index (load from disk if exists, otherwise create new)
 # You might want to specify a path to save/load the index
@@ -32,19 +42,21 @@ parser.add_argument(
     default=0.8,
     help="Distance threshold for matching (default: 1.0). Lower is stricter.",
 )
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=max(1, (os.cpu_count() or 2) // 2),
+    help="Number of parallel face analysis workers in comparison mode (default: half the CPU cores).",
+)
 args = parser.parse_args()
 # ---------------------------------------
 
-# Initialize with CPU only
-app = FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"])
-print("🔧 FaceAnalysis instance created")
-
-# Prepare
-app.prepare(ctx_id=-1, det_size=(640, 640))
-print("✅ App prepared successfully")
-
 # --- Register Mode ---
 if args.register:
+    # Use the shared, warmed-up FaceAnalysis instance
+    app = get_embedder().app
+    print("✅ App prepared successfully")
+
     register_path = args.register
     if not os.path.exists(register_path):
         print(f"❌ Registration image not found: {register_path}")
@@ -69,9 +81,8 @@ if args.register:
             f"⚠️ Multiple faces found in registration image {register_path}. Using the first one."
         )
 
-    embedding = faces[0].embedding
     # Normalize the embedding
-    embedding = embedding / np.linalg.norm(embedding)
+    embedding = vector_db.normalize_embeddings(faces[0].embedding.reshape(1, -1))[0]
     print("✅ Embedding generated for registration image:", register_path)
     print("📏 Embedding shape:", embedding.shape)
 
@@ -203,13 +214,16 @@ if not os.path.exists(test_match_dir):
     print(f"⚠️ Test match directory '{test_match_dir}' not found.")
     sys.exit(0)  # Not an error, just no directory to compare
 
-# Supported image extensions
-extensions = ["*.png", "*.jpg", "*.jpeg", "*.JPG", "*.JPEG", "*.PNG"]
+# Supported image extensions (matched case-insensitively)
+extensions = (".png", ".jpg", ".jpeg")
 
-# Get all image paths in test_match directory
-image_paths = []
-for ext in extensions:
-    image_paths.extend(glob(os.path.join(test_match_dir, ext)))
+# Get all image paths in test_match directory with a single directory scan
+with os.scandir(test_match_dir) as entries:
+    image_paths = sorted(
+        entry.path
+        for entry in entries
+        if entry.is_file() and entry.name.lower().endswith(extensions)
+    )
 
 if not image_paths:
     print("⚠️ No images found in current directory for comparison.")
@@ -221,39 +235,155 @@ print(f"🔍 Comparing {len(image_paths)} images against the registered template
 matched_images = []
 unmatched_images = []
 
-# --- Compare each image against the template ---
-for image_path in image_paths:
+# --- Embed each image using a bounded pool of workers ---
+# ONNX Runtime releases the GIL during inference, so each worker thread gets
+# its own FaceAnalysis instance with a share of the intra-op threads.
+worker_state = threading.local()
+
+
+def get_worker_app():
+    """Get the FaceAnalysis instance owned by the current worker thread"""
+    if args.workers == 1:
+        # A single worker can share the process-wide models
+        return get_embedder().app
+    if not hasattr(worker_state, "app"):
+        worker_app = FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"])
+        worker_app.prepare(ctx_id=-1, det_size=(640, 640))
+        # Split the cores between workers so their concurrent sessions don't oversubscribe them
+        set_intra_op_threads(worker_app, max(1, (os.cpu_count() or 1) // args.workers))
+        worker_state.app = worker_app
+    return worker_state.app
+
+
+def embed_image(image_path):
+    """Load an image and return the embedding of its first face, or None"""
     # Load the image
     img = cv2.imread(image_path)
     if img is None:
         print(f"⚠️ Could not read image: {image_path}")
-        continue
+        return None
 
-    # Convert to RGB
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    # Convert to RGB, reusing this worker's buffer for same-sized images
+    img_rgb = worker_state.rgb_buffer = bgr_to_rgb(
+        img, getattr(worker_state, "rgb_buffer", None)
+    )
 
     # Run face analysis
-    faces = app.get(img_rgb)
+    faces = get_worker_app().get(img_rgb)
     if len(faces) == 0:
         print(f"❌ No faces detected in {image_path}")
-        continue
+        return None
     elif len(faces) > 1:
         print(
             f"⚠️ Multiple faces found in {image_path}. Using the first one for comparison."
         )
 
-    embedding = faces[0].embedding
-    # Normalize the embedding
-    embedding = embedding / np.linalg.norm(embedding)
     print(f"✅ Embedding generated for {image_path}")
+    return faces[0].embedding
+
 
-    # --- Calculate distance to the template embedding ---
-    # Using L2 distance (Euclidean distance)
-    distance = np.linalg.norm(template_embedding - embedding)
+# --- On a CUDA device, detect per image but run recognition in batches ---
+# Aligned crops are stacked into one (N, 3, 112, 112) blob per forward pass,
+# which amortizes kernel launches. The live VideoStream pipeline stays on CPU.
+REC_BATCH_SIZE = 64
+use_cuda = "CUDAExecutionProvider" in onnxruntime.get_available_providers()
+
+
+def align_image(gpu_app, image_path, rgb_buffer=None):
+    """Load an image and return (aligned 112x112 crop of its first face or None, RGB buffer)"""
+    img = cv2.imread(image_path)
+    if img is None:
+        print(f"⚠️ Could not read image: {image_path}")
+        return None, rgb_buffer
+
+    img_rgb = rgb_buffer = bgr_to_rgb(img, rgb_buffer)
+    _, kpss = gpu_app.det_model.detect(img_rgb, max_num=0, metric="default")
+    if kpss is None or len(kpss) == 0:
+        print(f"❌ No faces detected in {image_path}")
+        return None, rgb_buffer
+    elif len(kpss) > 1:
+        print(
+            f"⚠️ Multiple faces found in {image_path}. Using the first one for comparison."
+        )
+    return face_align.norm_crop(img_rgb, landmark=kpss[0]), rgb_buffer
+
+
+embedded_paths = []
+raw_embeddings = []
+if use_cuda:
+    print("🚀 CUDA available, running batched recognition on the GPU")
+    gpu_app = FaceAnalysis(
+        name="buffalo_l",
+        providers=["CUDAExecutionProvider", "CPUExecutionProvider"],
+        allowed_modules=["detection", "recognition"],
+    )
+    gpu_app.prepare(ctx_id=0, det_size=(640, 640))
+    rec_model = gpu_app.models["recognition"]
+
+    crops = []
+    rgb_buffer = None
+    for image_path in image_paths:
+        crop, rgb_buffer = align_image(gpu_app, image_path, rgb_buffer)
+        if crop is not None:
+            embedded_paths.append(image_path)
+            crops.append(crop)
+
+    for start in range(0, len(crops), REC_BATCH_SIZE):
+        raw_embeddings.extend(rec_model.get_feat(crops[start:start + REC_BATCH_SIZE]))
+    print(f"✅ Embeddings generated for {len(embedded_paths)} images")
+else:
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for image_path, embedding in zip(image_paths, executor.map(embed_image, image_paths)):
+            if embedding is not None:
+                embedded_paths.append(image_path)
+                raw_embeddings.append(embedding)
+
+# Normalize all embeddings at once
+embeddings = (
+    vector_db.normalize_embeddings(np.stack(raw_embeddings))
+    if raw_embeddings
+    else np.empty((0, 512), dtype=np.float32)
+)
+
+# --- Calculate L2 distances to the template embedding ---
+# Below this many images the JIT kernel beats BLAS call/setup overhead
+NUMBA_MAX_ROWS = 256
+
+if numba is not None:
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def match_batch(embeddings, template, threshold):
+        """Compute L2 distances of each row to the template and the match mask"""
+        n, d = embeddings.shape
+        distances = np.empty(n, dtype=np.float32)
+        mask = np.empty(n, dtype=np.bool_)
+        for i in numba.prange(n):
+            acc = np.float32(0.0)
+            for j in range(d):
+                diff = embeddings[i, j] - template[j]
+                acc += diff * diff
+            distances[i] = np.sqrt(acc)
+            mask[i] = distances[i] < threshold
+        return distances, mask
+
+
+template = np.asarray(template_embedding, dtype=np.float32)
+if numba is not None and 0 < len(embeddings) <= NUMBA_MAX_ROWS:
+    distances, match_mask = match_batch(
+        np.ascontiguousarray(embeddings), template, np.float32(args.threshold)
+    )
+else:
+    # One GEMV; for unit-length rows: ||t - e||^2 = ||t||^2 + 1 - 2 * (e . t)
+    similarities = embeddings @ template
+    distances = np.sqrt(np.maximum(0.0, np.dot(template, template) + 1.0 - 2.0 * similarities))
+    match_mask = distances < args.threshold
+
+# --- Compare each embedding against the template ---
+for image_path, distance, is_match in zip(embedded_paths, distances, match_mask):
     print(f"📏 Distance between {image_path} and template: {distance:.4f}")
 
     # --- Determine match based on threshold ---
-    if distance < args.threshold:
+    if is_match:
         print(
             f"✅ MATCH: {image_path} is likely the same person as the template (Distance: {distance:.4f} < Threshold: {args.threshold})"
         )
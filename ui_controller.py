@@ -1,19 +1,121 @@
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox
+import tkinter.font as tkfont
+import asyncio
 import threading
 import queue
-import cv2
+import collections
+import functools
+import logging
+import re
+import time
 
 # Import camera detection function
-from camera_detector import detect_cameras
+from camera_detector import cached_cameras
+
+logger = logging.getLogger(__name__)
+
+# Interval (ms) for draining cross-thread queues and pumping asyncio from Tk
+POLL_MS = 8
+
+# Upper bound (ms) the drain interval backs off to while the pipeline is quiet
+IDLE_POLL_MS = 100
+
+# Interval (ms) for rendering coalesced status text, about one display frame
+STATUS_FLUSH_MS = 33
+
+# Re-enable Apply after this long (ms) if the pipeline never acknowledges a config
+APPLY_ACK_TIMEOUT_MS = 2000
+
+# Refresh clicks closer together than this (seconds) are ignored
+REFRESH_DEBOUNCE = 0.5
+
+# Pack options for the section header labels and their LabelFrames
+_PACK_SECTION_LABEL = {"anchor": tk.W, "pady": (0, 5)}
+_PACK_SECTION_FRAME = {"fill": tk.X, "pady": (0, 10)}
+
+# (label, value) choices for the processing mode and face detector radio buttons
+_MODE_CHOICES = (
+    ("Normal (Detect+Crop+Recognize)", "normal"),
+    ("Aligned Face (Skip Detection)", "aligned"),
+    ("Full Frame (Experimental)", "fullframe"),
+)
+_DETECTORS = (
+    ("RetinaFace", "retinaface"),
+    ("InsightFace", "insightface"),
+    ("SCRFD", "scrfd"),
+)
+
+def put_latest_config(config_queue, config):
+    """
+    Post a config without blocking the Tk thread.
+
+    At most one config is left waiting: an undelivered config is merged under the
+    new one, so newer values win while one-shot flags like capture_frame survive.
+    Works with queue.SimpleQueue (no task_done/join) as well as queue.Queue.
+    """
+    try:
+        while True:
+            config = {**config_queue.get_nowait(), **config}
+    except queue.Empty:
+        pass
+    config_queue.put_nowait(config)
+
+
+def _is_int_text(text):
+    """Entry validator: accept only digits (or an empty field while editing)"""
+    return re.fullmatch(r"[0-9]*", text) is not None
+
+
+def _is_float_text(text):
+    """Entry validator: accept only an unsigned decimal, possibly partially typed"""
+    return re.fullmatch(r"[0-9]*\.?[0-9]*", text) is not None
+
+
+@functools.lru_cache(maxsize=1)
+def _cached_detect(refresh=False):
+    """Probe cameras once; only an explicit refresh clears the cache"""
+    return tuple(str(i) for i in cached_cameras(refresh=refresh)) or ("0",)
 
 
 class UIController:
+    # Typed entry fields sent by _apply_settings: (attribute/config key, conversion)
+    _FIELD_SPEC = (
+        ("camera_source", int),
+        ("width", int),
+        ("height", int),
+        ("fps", int),
+        ("face_margin_ratio", float),
+        ("face_rect_thickness", int),
+        ("landmark_radius", int),
+        ("target_width", int),
+        ("target_height", int),
+        ("recognition_threshold", float),
+    )
+
+    # Checkbox/radio variables sent by _apply_settings as-is
+    _CHOICE_VARS = (
+        "processing_enabled",
+        "processing_mode",
+        "detector_type",
+        "convert_to_rgb",
+        "continuous_scanning",
+    )
+
     def __init__(self, config_queue):
         self.config_queue = config_queue
         self.root = None
-        self.ui_thread = None
-        self.running = False
+        # Set once the UI should close; safe to set and wait on from any thread
+        self._stop_event = threading.Event()
+
+        # Updates posted by the pipeline thread, applied on the Tk thread by _drain_results
+        self.result_queue = queue.SimpleQueue()
+        self._drain_interval = POLL_MS
+        self._metrics_render_pending = False
+
+        # Latest status text from the pipeline; only the newest one is rendered
+        self._pending_status = None
+        self._status_after_id = None
 
         # UI variables will be initialized in the UI thread
         self.camera_source = None
@@ -22,6 +124,10 @@ class UIController:
         self.fps = None
         self.processing_enabled = None
         self.status_label = None
+        self.metrics_label = None
+
+        # Ring buffer of recent metrics snapshots published by the main loop
+        self.metrics_history = collections.deque(maxlen=60)
 
         # Control state variables
         self.camera_streaming = True
@@ -30,34 +136,73 @@ class UIController:
         # User registration window reference
         self.registration_window = None
 
+        # Last full config sent by _apply_settings, used to send only changed keys
+        self._last_config = {}
+
+        # Single-flight Apply: further clicks are ignored until the pipeline acks
+        self.apply_btn = None
+        self._apply_in_flight = False
+        self._apply_timeout_id = None
+
+        # Widget tree is built once by _build_once and reused afterwards
+        self._built = False
+        self.main_frame = None
+
+        # asyncio loop for non-blocking handlers, pumped from the Tk main loop
+        self._loop = None
+        self._last_refresh = 0.0
+
     def start(self):
-        """Start the UI in a separate thread"""
-        self.running = True
-        self.ui_thread = threading.Thread(target=self._create_ui, daemon=True)
-        self.ui_thread.start()
+        """Build the UI and run the Tk main loop on the calling (main) thread"""
+        self.init()
+        self.run()
+
+    def init(self):
+        """Build the UI on the calling (main) thread without entering the Tk main loop"""
+        self._stop_event.clear()
+        self._loop = asyncio.new_event_loop()
+        self._build_once()
+        self.show()
+
+        # Drive the asyncio loop from Tk and start the initial camera probe
+        self.root.after(POLL_MS, self._pump_asyncio)
+        self._loop.create_task(self._probe_cameras())
+
+        # Apply updates posted by the pipeline thread
+        self.root.after(POLL_MS, self._drain_results)
+
+    def run(self):
+        """Run the Tk main loop on the calling thread until the window closes"""
+        self.root.mainloop()
 
     def stop(self):
-        """Stop the UI thread"""
-        self.running = False
-        if self.root:
-            self.root.quit()
+        """Ask the UI to close; safe to call from any thread"""
+        self._stop_event.set()
+
+    def wait_closed(self, timeout=None):
+        """Block until the UI has been asked to close, or the timeout expires"""
+        return self._stop_event.wait(timeout)
+
+    def _build_once(self):
+        """Build the window and widget tree; later calls reuse the existing widgets"""
+        if self._built:
+            return
 
-    def _create_ui(self):
-        """Create and run the Tkinter UI"""
         self.root = tk.Tk()
         self.root.title("SecureFace Control Panel")
         self.root.geometry("400x600")  # Adjusted height
         self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
 
-        # Initialize UI variables after root is created
-        # Detect available cameras
-        available_cameras = detect_cameras()
-        if not available_cameras:
-            available_cameras = ["0"]  # Fallback to default if no cameras detected
+        # Shared fonts for the panel title and section headers, applied via ttk styles
+        self.title_font = tkfont.Font(family="Arial", size=12, weight="bold")
+        self.section_font = tkfont.Font(family="Arial", size=10, weight="bold")
+        style = ttk.Style(self.root)
+        style.configure("Title.TLabel", font=self.title_font)
+        style.configure("Section.TLabel", font=self.section_font)
 
-        self.camera_source = tk.StringVar(
-            value=str(available_cameras[0]) if available_cameras else "0"
-        )
+        # Initialize UI variables after root is created
+        # Detected cameras are filled in by _probe_cameras once the probe finishes
+        self.camera_source = tk.StringVar(value="0")
         self.width = tk.StringVar(value="640")
         self.height = tk.StringVar(value="480")
         self.fps = tk.StringVar(value="60")
@@ -75,6 +220,9 @@ class UIController:
         self.processing_mode = tk.StringVar(
             value="normal"
         )  # normal, aligned, fullframe
+        self.detector_type = tk.StringVar(
+            value="retinaface"
+        )  # retinaface, insightface, or scrfd
         self.target_width = tk.StringVar(value="112")
         self.target_height = tk.StringVar(value="112")
 
@@ -82,70 +230,85 @@ class UIController:
         self.continuous_scanning = tk.BooleanVar(value=False)
         self.recognition_threshold = tk.StringVar(value="1.0")
 
+        # Converted field values from the last Apply; edited variables are marked dirty
+        self._field_values = {}
+        self._dirty = set()
+        for key in [key for key, _ in self._FIELD_SPEC] + list(self._CHOICE_VARS):
+            self._dirty.add(key)
+            getattr(self, key).trace_add(
+                "write", lambda *_, key=key: self._dirty.add(key)
+            )
+
+        # Reject non-numeric keystrokes in the numeric entries up front
+        int_entry = {
+            "validate": "key",
+            "validatecommand": (self.root.register(_is_int_text), "%P"),
+        }
+        float_entry = {
+            "validate": "key",
+            "validatecommand": (self.root.register(_is_float_text), "%P"),
+        }
+
         # Main frame
         main_frame = ttk.Frame(self.root)
-        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
         # Title
         title_label = ttk.Label(
-            main_frame, text="SecureFace Control Panel", font=("Arial", 12, "bold")
+            main_frame, text="SecureFace Control Panel", style="Title.TLabel"
         )
-        title_label.pack(pady=(0, 10))
 
         # Camera settings section
         camera_label = ttk.Label(
-            main_frame, text="Camera Settings", font=("Arial", 10, "bold")
+            main_frame, text="Camera Settings", style="Section.TLabel"
         )
-        camera_label.pack(anchor=tk.W, pady=(0, 5))
 
         camera_frame = ttk.LabelFrame(main_frame, text="Camera Configuration")
-        camera_frame.pack(fill=tk.X, pady=(0, 10))
+        camera_frame.columnconfigure(1, weight=1)
 
         # Camera source
-        source_frame = ttk.Frame(camera_frame)
-        source_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(source_frame, text="Camera Source:").pack(side=tk.LEFT)
+        ttk.Label(camera_frame, text="Camera Source:").grid(
+            row=0, column=0, sticky="w", pady=5
+        )
         # Use detected cameras for the dropdown
-        camera_sources = [str(i) for i in detect_cameras()] or ["0"]
         self.camera_combo = ttk.Combobox(
-            source_frame,
+            camera_frame,
             textvariable=self.camera_source,
-            values=camera_sources,
+            values=("0",),
             state="readonly",
             width=5,
         )
-        self.camera_combo.pack(side=tk.LEFT, padx=(5, 0))
+        self.camera_combo.grid(row=0, column=1, sticky="w", padx=(5, 0))
 
         # Refresh cameras button
         refresh_btn = ttk.Button(
-            source_frame, text="Refresh", command=self._refresh_cameras, width=8
+            camera_frame, text="Refresh", command=self._refresh_cameras, width=8
         )
-        refresh_btn.pack(side=tk.RIGHT)
+        refresh_btn.grid(row=0, column=2, columnspan=3, sticky="e")
 
         # Resolution
-        resolution_frame = ttk.Frame(camera_frame)
-        resolution_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(resolution_frame, text="Resolution:").pack(side=tk.LEFT)
-        width_frame = ttk.Frame(resolution_frame)
-        width_frame.pack(side=tk.RIGHT)
-        ttk.Entry(width_frame, textvariable=self.width, width=6).pack(side=tk.LEFT)
-        ttk.Label(width_frame, text="x").pack(side=tk.LEFT, padx=2)
-        ttk.Entry(width_frame, textvariable=self.height, width=6).pack(side=tk.LEFT)
+        ttk.Label(camera_frame, text="Resolution:").grid(
+            row=1, column=0, sticky="w", pady=5
+        )
+        ttk.Entry(
+            camera_frame, textvariable=self.width, width=6, **int_entry
+        ).grid(row=1, column=2)
+        ttk.Label(camera_frame, text="x").grid(row=1, column=3, padx=2)
+        ttk.Entry(
+            camera_frame, textvariable=self.height, width=6, **int_entry
+        ).grid(row=1, column=4)
 
         # FPS
-        fps_frame = ttk.Frame(camera_frame)
-        fps_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(fps_frame, text="FPS:").pack(side=tk.LEFT)
-        ttk.Entry(fps_frame, textvariable=self.fps, width=8).pack(side=tk.RIGHT)
+        ttk.Label(camera_frame, text="FPS:").grid(row=2, column=0, sticky="w", pady=5)
+        ttk.Entry(camera_frame, textvariable=self.fps, width=8, **int_entry).grid(
+            row=2, column=2, columnspan=3, sticky="e"
+        )
 
         # Processing settings section
         processing_label = ttk.Label(
-            main_frame, text="Processing Settings", font=("Arial", 10, "bold")
+            main_frame, text="Processing Settings", style="Section.TLabel"
         )
-        processing_label.pack(anchor=tk.W, pady=(0, 5))
 
         processing_frame = ttk.LabelFrame(main_frame, text="Processing Configuration")
-        processing_frame.pack(fill=tk.X, pady=(0, 10))
 
         # Processing toggle
         ttk.Checkbutton(
@@ -154,273 +317,400 @@ class UIController:
 
         # Face detection settings section
         face_label = ttk.Label(
-            main_frame, text="Face Detection Settings", font=("Arial", 10, "bold")
+            main_frame, text="Face Detection Settings", style="Section.TLabel"
         )
-        face_label.pack(anchor=tk.W, pady=(0, 5))
 
         face_frame = ttk.LabelFrame(main_frame, text="Face Detection Configuration")
-        face_frame.pack(fill=tk.X, pady=(0, 10))
+        face_frame.columnconfigure(1, weight=1)
 
         # Face margin ratio
-        margin_frame = ttk.Frame(face_frame)
-        margin_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(margin_frame, text="Face Margin Ratio:").pack(side=tk.LEFT)
-        ttk.Entry(margin_frame, textvariable=self.face_margin_ratio, width=8).pack(
-            side=tk.RIGHT
+        ttk.Label(face_frame, text="Face Margin Ratio:").grid(
+            row=0, column=0, sticky="w", pady=5
         )
+        ttk.Entry(
+            face_frame, textvariable=self.face_margin_ratio, width=8, **float_entry
+        ).grid(row=0, column=1, sticky="e")
 
         # Rectangle thickness
-        rect_frame = ttk.Frame(face_frame)
-        rect_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(rect_frame, text="Rectangle Thickness:").pack(side=tk.LEFT)
-        ttk.Entry(rect_frame, textvariable=self.face_rect_thickness, width=8).pack(
-            side=tk.RIGHT
+        ttk.Label(face_frame, text="Rectangle Thickness:").grid(
+            row=1, column=0, sticky="w", pady=5
         )
+        ttk.Entry(
+            face_frame, textvariable=self.face_rect_thickness, width=8, **int_entry
+        ).grid(row=1, column=1, sticky="e")
 
         # Landmark radius
-        landmark_frame = ttk.Frame(face_frame)
-        landmark_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(landmark_frame, text="Landmark Radius:").pack(side=tk.LEFT)
-        ttk.Entry(landmark_frame, textvariable=self.landmark_radius, width=8).pack(
-            side=tk.RIGHT
+        ttk.Label(face_frame, text="Landmark Radius:").grid(
+            row=2, column=0, sticky="w", pady=5
         )
+        ttk.Entry(
+            face_frame, textvariable=self.landmark_radius, width=8, **int_entry
+        ).grid(row=2, column=1, sticky="e")
 
         # Preprocessing settings section
         preprocessing_label = ttk.Label(
-            main_frame, text="Preprocessing Settings", font=("Arial", 10, "bold")
+            main_frame, text="Preprocessing Settings", style="Section.TLabel"
         )
-        preprocessing_label.pack(anchor=tk.W, pady=(0, 5))
 
         preprocessing_frame = ttk.LabelFrame(
             main_frame, text="Preprocessing Configuration"
         )
-        preprocessing_frame.pack(fill=tk.X, pady=(0, 10))
+        preprocessing_frame.columnconfigure(1, weight=1)
 
         # Mode selection
-        mode_frame = ttk.Frame(preprocessing_frame)
-        mode_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(mode_frame, text="Processing Mode:").pack(anchor=tk.W)
+        ttk.Label(preprocessing_frame, text="Processing Mode:").grid(
+            row=0, column=0, columnspan=5, sticky="w", pady=(5, 0)
+        )
 
         # Radio buttons for mode selection
-        self.processing_mode = tk.StringVar(
-            value="normal"
-        )  # normal, aligned, fullframe
-        ttk.Radiobutton(
-            mode_frame,
-            text="Normal (Detect+Crop+Recognize)",
-            variable=self.processing_mode,
-            value="normal",
-        ).pack(anchor=tk.W)
-        ttk.Radiobutton(
-            mode_frame,
-            text="Aligned Face (Skip Detection)",
-            variable=self.processing_mode,
-            value="aligned",
-        ).pack(anchor=tk.W)
-        ttk.Radiobutton(
-            mode_frame,
-            text="Full Frame (Experimental)",
-            variable=self.processing_mode,
-            value="fullframe",
-        ).pack(anchor=tk.W)
+        for row, (text, value) in enumerate(_MODE_CHOICES, start=1):
+            ttk.Radiobutton(
+                preprocessing_frame,
+                text=text,
+                variable=self.processing_mode,
+                value=value,
+            ).grid(row=row, column=0, columnspan=5, sticky="w")
 
         # Detector selection
-        detector_frame = ttk.Frame(preprocessing_frame)
-        detector_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(detector_frame, text="Face Detector:").pack(anchor=tk.W)
+        ttk.Label(preprocessing_frame, text="Face Detector:").grid(
+            row=4, column=0, columnspan=5, sticky="w", pady=(5, 0)
+        )
 
         # Radio buttons for detector selection
-        self.detector_type = tk.StringVar(
-            value="retinaface"
-        )  # retinaface, insightface, or scrfd
-        ttk.Radiobutton(
-            detector_frame,
-            text="RetinaFace",
-            variable=self.detector_type,
-            value="retinaface",
-        ).pack(anchor=tk.W)
-        ttk.Radiobutton(
-            detector_frame,
-            text="InsightFace",
-            variable=self.detector_type,
-            value="insightface",
-        ).pack(anchor=tk.W)
-        ttk.Radiobutton(
-            detector_frame,
-            text="SCRFD",
-            variable=self.detector_type,
-            value="scrfd",
-        ).pack(anchor=tk.W)
+        for row, (text, value) in enumerate(_DETECTORS, start=5):
+            ttk.Radiobutton(
+                preprocessing_frame,
+                text=text,
+                variable=self.detector_type,
+                value=value,
+            ).grid(row=row, column=0, columnspan=5, sticky="w")
 
         # RGB conversion toggle
         ttk.Checkbutton(
             preprocessing_frame, text="Convert to RGB", variable=self.convert_to_rgb
-        ).pack(anchor=tk.W, pady=5)
+        ).grid(row=8, column=0, columnspan=5, sticky="w", pady=5)
 
         # Target size
-        size_frame = ttk.Frame(preprocessing_frame)
-        size_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(size_frame, text="Target Size:").pack(side=tk.LEFT)
-        width_frame = ttk.Frame(size_frame)
-        width_frame.pack(side=tk.RIGHT)
-        ttk.Entry(width_frame, textvariable=self.target_width, width=6).pack(
-            side=tk.LEFT
-        )
-        ttk.Label(width_frame, text="x").pack(side=tk.LEFT, padx=2)
-        ttk.Entry(width_frame, textvariable=self.target_height, width=6).pack(
-            side=tk.LEFT
+        ttk.Label(preprocessing_frame, text="Target Size:").grid(
+            row=9, column=0, sticky="w", pady=5
         )
+        ttk.Entry(
+            preprocessing_frame, textvariable=self.target_width, width=6, **int_entry
+        ).grid(row=9, column=2)
+        ttk.Label(preprocessing_frame, text="x").grid(row=9, column=3, padx=2)
+        ttk.Entry(
+            preprocessing_frame, textvariable=self.target_height, width=6, **int_entry
+        ).grid(row=9, column=4)
 
         # Recognition settings section
         recognition_label = ttk.Label(
-            main_frame, text="Recognition Settings", font=("Arial", 10, "bold")
+            main_frame, text="Recognition Settings", style="Section.TLabel"
         )
-        recognition_label.pack(anchor=tk.W, pady=(0, 5))
 
         recognition_frame = ttk.LabelFrame(
             main_frame, text="Face Recognition Configuration"
         )
-        recognition_frame.pack(fill=tk.X, pady=(0, 10))
+        recognition_frame.columnconfigure(1, weight=1)
 
         # Continuous scanning toggle
         ttk.Checkbutton(
             recognition_frame,
             text="Enable Continuous Scanning",
             variable=self.continuous_scanning,
-        ).pack(anchor=tk.W, pady=5)
+        ).grid(row=0, column=0, columnspan=2, sticky="w", pady=5)
 
         # Recognition threshold
-        threshold_frame = ttk.Frame(recognition_frame)
-        threshold_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(threshold_frame, text="Recognition Threshold:").pack(side=tk.LEFT)
+        ttk.Label(recognition_frame, text="Recognition Threshold:").grid(
+            row=1, column=0, sticky="w", pady=5
+        )
         ttk.Entry(
-            threshold_frame, textvariable=self.recognition_threshold, width=8
-        ).pack(side=tk.RIGHT)
+            recognition_frame,
+            textvariable=self.recognition_threshold,
+            width=8,
+            **float_entry,
+        ).grid(row=1, column=1, sticky="e")
 
         # Control buttons section
         control_label = ttk.Label(
-            main_frame, text="Controls", font=("Arial", 10, "bold")
+            main_frame, text="Controls", style="Section.TLabel"
         )
-        control_label.pack(anchor=tk.W, pady=(0, 5))
 
         control_frame = ttk.LabelFrame(main_frame, text="Control Buttons")
-        control_frame.pack(fill=tk.X, pady=(0, 10))
+        control_frame.columnconfigure(1, weight=1)
 
         # Camera stream control buttons
-        camera_control_frame = ttk.Frame(control_frame)
-        camera_control_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(camera_control_frame, text="Camera Stream:").pack(side=tk.LEFT)
+        ttk.Label(control_frame, text="Camera Stream:").grid(
+            row=0, column=0, sticky="w", pady=5
+        )
         self.camera_btn = ttk.Button(
-            camera_control_frame, text="Pause", command=self._toggle_camera
+            control_frame, text="Pause", command=self._toggle_camera
         )
-        self.camera_btn.pack(side=tk.RIGHT)
+        self.camera_btn.grid(row=0, column=1, sticky="e")
 
         # Processing control buttons
-        processing_control_frame = ttk.Frame(control_frame)
-        processing_control_frame.pack(fill=tk.X, pady=5)
-        ttk.Label(processing_control_frame, text="Processing:").pack(side=tk.LEFT)
+        ttk.Label(control_frame, text="Processing:").grid(
+            row=1, column=0, sticky="w", pady=5
+        )
         self.processing_btn = ttk.Button(
-            processing_control_frame, text="Pause", command=self._toggle_processing
+            control_frame, text="Pause", command=self._toggle_processing
         )
-        self.processing_btn.pack(side=tk.RIGHT)
+        self.processing_btn.grid(row=1, column=1, sticky="e")
 
         # Apply button
-        apply_btn = ttk.Button(
+        apply_btn = self.apply_btn = ttk.Button(
             main_frame, text="Apply Settings", command=self._apply_settings
         )
-        apply_btn.pack(side=tk.RIGHT, pady=(0, 5))
 
         # Register new user button
         register_btn = ttk.Button(
             main_frame, text="Register New User", command=self._open_add_user_form
         )
-        register_btn.pack(side=tk.RIGHT, padx=(0, 10), pady=(0, 5))
+
+        # Metrics label
+        self.metrics_label = ttk.Label(main_frame, text="Waiting for metrics...")
 
         # Status label
         self.status_label = ttk.Label(main_frame, text="Ready")
-        self.status_label.pack(side=tk.LEFT, pady=(0, 5))
 
-        # Start the UI loop
-        self.root.mainloop()
+        # Pack main_frame's children, in order, from one declarative table
+        packs = (
+            (title_label, {"pady": (0, 10)}),
+            (camera_label, _PACK_SECTION_LABEL),
+            (camera_frame, _PACK_SECTION_FRAME),
+            (processing_label, _PACK_SECTION_LABEL),
+            (processing_frame, _PACK_SECTION_FRAME),
+            (face_label, _PACK_SECTION_LABEL),
+            (face_frame, _PACK_SECTION_FRAME),
+            (preprocessing_label, _PACK_SECTION_LABEL),
+            (preprocessing_frame, _PACK_SECTION_FRAME),
+            (recognition_label, _PACK_SECTION_LABEL),
+            (recognition_frame, _PACK_SECTION_FRAME),
+            (control_label, _PACK_SECTION_LABEL),
+            (control_frame, _PACK_SECTION_FRAME),
+            (apply_btn, {"side": tk.RIGHT, "pady": (0, 5)}),
+            (register_btn, {"side": tk.RIGHT, "padx": (0, 10), "pady": (0, 5)}),
+            (self.metrics_label, {"side": tk.BOTTOM, "anchor": tk.W, "pady": (0, 5)}),
+            (self.status_label, {"side": tk.LEFT, "pady": (0, 5)}),
+        )
+        for widget, options in packs:
+            widget.pack(**options)
+
+        # Keep the containers so the panel can be hidden and shown without rebuilding
+        self.main_frame = main_frame
+        self.camera_frame = camera_frame
+        self.processing_frame = processing_frame
+        self.face_frame = face_frame
+        self.preprocessing_frame = preprocessing_frame
+        self.recognition_frame = recognition_frame
+        self.control_frame = control_frame
+        self._built = True
+
+    def show(self):
+        """Show the control panel widgets"""
+        self.main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+    def hide(self):
+        """Hide the control panel widgets, keeping them alive for the next show()"""
+        self.main_frame.pack_forget()
 
     def _toggle_camera(self):
         """Toggle camera streaming"""
-        self.camera_streaming = not self.camera_streaming
-        if self.camera_streaming:
-            self.camera_btn.config(text="Pause")
-            self.status_label.config(text="Camera streaming resumed")
-        else:
-            self.camera_btn.config(text="Start")
-            self.status_label.config(text="Camera streaming paused")
+        self._set_toggle(
+            "camera_streaming",
+            self.camera_btn,
+            "Camera streaming resumed",
+            "Camera streaming paused",
+        )
 
     def _toggle_processing(self):
         """Toggle frame processing"""
-        self.processing_active = not self.processing_active
-        if self.processing_active:
-            self.processing_btn.config(text="Pause")
-            self.status_label.config(text="Processing resumed")
-        else:
-            self.processing_btn.config(text="Start")
-            self.status_label.config(text="Processing paused")
+        self._set_toggle(
+            "processing_active",
+            self.processing_btn,
+            "Processing resumed",
+            "Processing paused",
+        )
+
+    def _set_toggle(self, attr, btn, on_msg, off_msg):
+        """Flip a boolean control, relabel its button and post the matching status"""
+        value = not getattr(self, attr)
+        setattr(self, attr, value)
+        btn.config(text="Pause" if value else "Start")
+        self.update_status(on_msg if value else off_msg)
+        self._schedule_status_flush()
 
     def _apply_settings(self):
-        """Send configuration to the main application"""
-        try:
-            config = {
-                "camera_source": int(self.camera_source.get()),
-                "width": int(self.width.get()),
-                "height": int(self.height.get()),
-                "fps": int(self.fps.get()),
-                "processing_enabled": self.processing_enabled.get(),
-                "camera_streaming": self.camera_streaming,
-                "processing_active": self.processing_active,
-                "face_margin_ratio": float(self.face_margin_ratio.get()),
-                "face_rect_thickness": int(self.face_rect_thickness.get()),
-                "landmark_radius": int(self.landmark_radius.get()),
-                "processing_mode": self.processing_mode.get(),
-                "detector_type": self.detector_type.get(),
-                "convert_to_rgb": self.convert_to_rgb.get(),
-                "target_width": int(self.target_width.get()),
-                "target_height": int(self.target_height.get()),
-                "continuous_scanning": self.continuous_scanning.get(),
-                "recognition_threshold": float(self.recognition_threshold.get()),
-            }
-
-            # Put config in queue for main thread to process
-            self.config_queue.put(config)
-            self.status_label.config(text="Settings applied")
-        except ValueError as e:
-            self.status_label.config(text=f"Invalid input values: {str(e)}")
-        except Exception as e:
-            self.status_label.config(text=f"Error applying settings: {str(e)}")
+        """
+        Send changed settings to the main application.
+
+        Only keys whose values differ from the last Apply are queued; consumers
+        must treat a missing key as "unchanged". The first Apply sends everything.
+        While a config is in flight the button is disabled and clicks are ignored
+        until the pipeline calls config_applied().
+        """
+        if self._apply_in_flight:
+            return
+
+        # Nothing edited and no toggle flipped since the last Apply: skip all work
+        if (
+            not self._dirty
+            and self._last_config.get("camera_streaming") == self.camera_streaming
+            and self._last_config.get("processing_active") == self.processing_active
+        ):
+            self.status_label.config(text="No changes")
+            return
+
+        # Only re-read and convert fields edited since the last Apply. Entries
+        # only accept digits and "."; the only invalid states left are empty ones
+        for key, cast in self._FIELD_SPEC:
+            if key not in self._dirty:
+                continue
+            value = getattr(self, key).get()
+            if value in ("", "."):
+                self.status_label.config(text=f"Invalid value for {key}: {value!r}")
+                return
+            self._field_values[key] = cast(value)
+        for key in self._CHOICE_VARS:
+            if key in self._dirty:
+                self._field_values[key] = getattr(self, key).get()
+        self._dirty.clear()
+
+        config = dict(self._field_values)
+        config.update(
+            camera_streaming=self.camera_streaming,
+            processing_active=self.processing_active,
+        )
+
+        delta = {
+            key: value
+            for key, value in config.items()
+            if key not in self._last_config or self._last_config[key] != value
+        }
+        if not delta:
+            self.status_label.config(text="No changes")
+            return
+
+        # Put config in queue for the pipeline thread to process
+        put_latest_config(self.config_queue, delta)
+        self._last_config = config
+        self._apply_in_flight = True
+        self.apply_btn.config(state=tk.DISABLED)
+        self._apply_timeout_id = self.root.after(
+            APPLY_ACK_TIMEOUT_MS, self._finish_apply, "Settings sent"
+        )
+        self.status_label.config(text="Applying settings...")
+
+    def config_applied(self):
+        """Acknowledge that the pipeline applied a config; safe to call from any thread"""
+        self.result_queue.put(("config_applied", None))
+
+    def _finish_apply(self, text="Settings applied"):
+        """End the in-flight Apply and re-enable the button"""
+        if self._apply_timeout_id is not None:
+            self.root.after_cancel(self._apply_timeout_id)
+            self._apply_timeout_id = None
+        if not self._apply_in_flight:
+            return
+        self._apply_in_flight = False
+        self.apply_btn.config(state=tk.NORMAL)
+        self.status_label.config(text=text)
 
     def _on_closing(self):
         """Handle window closing"""
-        self.running = False
+        self._stop_event.set()
         self.root.destroy()
 
     def update_status(self, text):
-        """Update status label from main thread"""
-        if self.root and self.running:
-            self.root.after(0, lambda: self.status_label.config(text=text))
+        """Update status label from the pipeline thread (coalesced by _flush_status)"""
+        self._pending_status = text
+
+    def set_metrics(self, metrics):
+        """Publish a metrics snapshot from the pipeline thread to be rendered in the UI"""
+        self.result_queue.put(("metrics", dict(metrics)))
+
+    def _drain_results(self):
+        """Apply all queued pipeline updates on the Tk thread, then poll again"""
+        if self._stop_event.is_set():
+            self.root.destroy()
+            return
+
+        drained = False
+        try:
+            while True:
+                kind, payload = self.result_queue.get_nowait()
+                drained = True
+                if kind == "metrics":
+                    self.metrics_history.append(payload)
+                    # Several snapshots drained together collapse into one idle-time repaint
+                    if not self._metrics_render_pending:
+                        self._metrics_render_pending = True
+                        self.root.after_idle(self._render_metrics)
+                elif kind == "captured_frame":
+                    self._forward_captured_frame(payload)
+                elif kind == "config_applied":
+                    self._finish_apply()
+        except queue.Empty:
+            pass
+
+        self._schedule_status_flush()
+
+        # Poll fast while updates are flowing, back off towards IDLE_POLL_MS when quiet
+        if drained or self._pending_status is not None:
+            self._drain_interval = POLL_MS
+        else:
+            self._drain_interval = min(self._drain_interval * 2, IDLE_POLL_MS)
+        self.root.after(self._drain_interval, self._drain_results)
+
+    def _schedule_status_flush(self):
+        """Trailing-edge debounce: at most one status repaint per STATUS_FLUSH_MS (Tk thread only)"""
+        if self._pending_status is not None and self._status_after_id is None:
+            self._status_after_id = self.root.after(STATUS_FLUSH_MS, self._flush_status)
+
+    def _flush_status(self):
+        """Render the newest pending status text at most once per display frame"""
+        self._status_after_id = None
+        text, self._pending_status = self._pending_status, None
+        if text is not None and text != self.status_label.cget("text"):
+            self.status_label.config(text=text)
+            # Repaint just the label without dispatching pending input events
+            self.status_label.update_idletasks()
+
+    def _render_metrics(self):
+        """Render the latest metrics snapshot"""
+        self._metrics_render_pending = False
+        if not self.metrics_history:
+            return
+        metrics = self.metrics_history[-1]
+        self.metrics_label.config(
+            text=(
+                f"Camera FPS: {metrics['cap_fps']:.1f} | "
+                f"Processing FPS: {metrics['proc_fps']:.1f}\n"
+                f"Queue: {metrics['in_q_depth']} (max {metrics['in_q_high_water']}) | "
+                f"Drops: {metrics['drops']} | Skip: 1/{metrics['skip']}"
+            )
+        )
 
     def set_captured_frame(self, frame):
+        """Hand a captured frame from the pipeline thread to the registration window"""
+        # Stream frames are views into its ring buffer; copy before crossing threads.
+        # This is the only copy: the registration window keeps this array as-is
+        self.result_queue.put(("captured_frame", frame.copy()))
+
+    def _forward_captured_frame(self, frame):
         """Set the captured frame for user registration"""
-        print(f"📥 UI Controller received captured frame - shape: {frame.shape}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received captured frame - shape: %s", frame.shape)
         # Pass the captured frame to the registration window if it exists
         if self.registration_window:
-            print("📤 Forwarding frame to registration window")
             try:
                 self.registration_window.set_captured_frame(frame)
-                print("✅ Frame successfully forwarded to registration window")
+                logger.debug("Frame forwarded to registration window")
             except Exception as e:
                 error_msg = f"Failed to set captured frame: {str(e)}"
-                print(f"❌ {error_msg}")
-                import tkinter.messagebox as messagebox
-
+                logger.error(error_msg)
                 messagebox.showerror("Error", error_msg)
         else:
-            print("⚠️ No registration window found to receive the frame")
+            logger.warning("No registration window found to receive the frame")
 
     def _open_add_user_form(self):
         """Open the user registration form"""
@@ -433,22 +723,40 @@ class UIController:
                 self.root, self.config_queue
             )
         except Exception as e:
-            import tkinter.messagebox as messagebox
-
             messagebox.showerror("Error", f"Failed to open registration form: {str(e)}")
 
     def _refresh_cameras(self):
         """Refresh the list of available cameras"""
-        # Detect available cameras
-        available_cameras = [str(i) for i in detect_cameras()] or ["0"]
-
-        # Update the combobox values
-        self.camera_combo["values"] = available_cameras
+        now = time.monotonic()
+        if now - self._last_refresh < REFRESH_DEBOUNCE:
+            return
+        self._last_refresh = now
+
+        # Re-probe cameras in the background, replacing the cached list
+        self.status_label.config(text="Detecting cameras...")
+        self._loop.create_task(self._probe_cameras(refresh=True))
+
+    def _pump_asyncio(self):
+        """Run the asyncio callbacks that are ready, then yield back to Tk"""
+        self._loop.call_soon(self._loop.stop)
+        self._loop.run_forever()
+        self.root.after(POLL_MS, self._pump_asyncio)
+
+    async def _probe_cameras(self, refresh=False):
+        """Detect cameras in a worker thread and update the camera dropdown"""
+        if refresh:
+            _cached_detect.cache_clear()
+        available_cameras = await asyncio.to_thread(_cached_detect, refresh)
+
+        # Update the combobox values only if the camera list changed
+        if tuple(map(str, self.camera_combo["values"])) != available_cameras:
+            self.camera_combo["values"] = available_cameras
 
         # If current selection is not in the new list, select the first one
         if self.camera_source.get() not in available_cameras:
             self.camera_source.set(available_cameras[0])
 
-        self.status_label.config(
-            text=f"Cameras refreshed. Available: {', '.join(available_cameras)}"
-        )
+        if refresh:
+            self.status_label.config(
+                text=f"Cameras refreshed. Available: {', '.join(available_cameras)}"
+            )
@@ -5,11 +5,69 @@ import threading
 import queue
 import os
 import time
+import math
+import uuid
+import logging
 import psycopg2
+from concurrent.futures import ThreadPoolExecutor
 from database.connection import DatabaseConnection
+from database.db import SecureFaceDB
 import numpy as np
-from embedder import FaceEmbedder
+from embedder import get_embedder
 import vector_db
+from ui_controller import put_latest_config
+
+logger = logging.getLogger(__name__)
+
+# How often the Tk thread checks for the registration worker's result
+RESULT_POLL_MS = 50
+
+# Captured frames are shrunk so their longer side is at most this before detection
+# (matches the embedder's 640x640 det_size, so no detail the detector sees is lost)
+DETECT_MAX_SIDE = 640
+
+# Encoding settings for stored user photos; optimize=0 skips libjpeg's extra Huffman pass
+JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 85, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+
+# Encoded photos are written to disk here so registration doesn't wait on the filesystem.
+# concurrent.futures joins its workers at interpreter exit, so queued writes still land.
+_image_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-image-writer")
+
+# Face detection + embedding of a captured photo starts as soon as the frame arrives,
+# overlapping with the operator filling in the form; registration reuses the result
+_embed_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-embedding")
+
+# Role choices are reused across registration windows for this many seconds
+ROLES_CACHE_TTL = 300.0
+_roles_cache = {"ts": 0.0, "values": None}
+
+# Read registered rows back from PostgreSQL/FAISS after saving (debugging aid, costs extra round trips)
+VERIFY_REGISTRATION = os.environ.get("SECUREFACE_VERIFY_REGISTRATION") == "1"
+
+
+def _write_file_atomic(path, data):
+    """Write bytes to path via a temporary file so readers never see a partial image"""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error("Failed to write user image %s: %s", path, e)
+
+
+def _bbox_area(face):
+    """Area of an InsightFace detection's bounding box"""
+    x1, y1, x2, y2 = face.bbox
+    return (x2 - x1) * (y2 - y1)
+
+
+def _remove_file(path):
+    """Delete a file if it exists"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
 
 class UserRegistrationWindow:
@@ -19,6 +77,9 @@ class UserRegistrationWindow:
         self.window = None
         self.capturing = False
         self.captured_frame = None
+        self.captured_embedding = None  # Future for the captured frame's embedding
+        # (ok, message) posted by the registration worker thread, drained on the Tk thread
+        self.result_queue = queue.SimpleQueue()
 
         # Create user_images directory if it doesn't exist
         if not os.path.exists("user_images"):
@@ -122,401 +183,345 @@ class UserRegistrationWindow:
         # Bind window close event
         self.window.protocol("WM_DELETE_WINDOW", self._cancel_registration)
 
+    @staticmethod
+    def invalidate_roles_cache():
+        """Force the next registration window to re-read roles (call after editing the roles table)"""
+        _roles_cache["values"] = None
+
     def _populate_roles(self):
-        """Populate the role combobox with available roles from database"""
+        """Populate the role combobox with available roles, cached for ROLES_CACHE_TTL seconds"""
+        role_values = _roles_cache["values"]
+        if role_values is None or time.monotonic() - _roles_cache["ts"] > ROLES_CACHE_TTL:
+            role_values = self._fetch_roles()
+            if role_values is None:
+                return
+            _roles_cache.update(ts=time.monotonic(), values=role_values)
+
+        self.role_combo["values"] = role_values
+        if role_values:
+            self.role_combo.current(0)  # Select first role by default
+
+    def _fetch_roles(self):
+        """Read the role choices from the database; returns None (after reporting) on error"""
         try:
             db_conn = DatabaseConnection()
             if db_conn.connect():
                 roles = db_conn.execute_query(
                     "SELECT role_id, role_name FROM roles ORDER BY access_level DESC"
                 )
-                if roles:
-                    # Format for combobox: "Role Name (ID)"
-                    role_values = [
-                        f"{role['role_name']} ({role['role_id']})" for role in roles
-                    ]
-                    self.role_combo["values"] = role_values
-                    if role_values:
-                        self.role_combo.current(0)  # Select first role by default
                 db_conn.disconnect()
+                if roles is None:
+                    return None  # Query failed; don't cache an empty list
+                # Format for combobox: "Role Name (ID)"
+                return [f"{role['role_name']} ({role['role_id']})" for role in roles]
             else:
                 messagebox.showerror(
                     "Database Error", "Could not connect to database to fetch roles"
                 )
         except Exception as e:
             messagebox.showerror("Error", f"Error fetching roles: {str(e)}")
+        return None
 
     def _take_photo(self):
         """Capture the current frame from the camera"""
-        print("📸 Take Photo button clicked - initiating frame capture process")
         # Request a frame capture from the main application
         try:
             config = {
                 "capture_frame": True  # Special flag to request frame capture
             }
-            print(
-                "📤 Sending capture_frame request to main application via config queue"
-            )
-            self.config_queue.put(config)
+            logger.debug("Sending capture_frame request to main application")
+            put_latest_config(self.config_queue, config)
 
             # Update UI to show we're waiting for frame
-            print("🔄 Updating UI to show capturing state")
             self.photo_status.config(text="Capturing frame...")
             self.take_photo_btn.config(state=tk.DISABLED)
 
             # We'll enable the button again after a short delay
-            print("⏰ Setting up UI re-enable timer")
-            self.window.after(1000, lambda: self.take_photo_btn.config(state=tk.NORMAL))
-            print("✅ Frame capture request sent successfully")
+            self.window.after(1000, self.take_photo_btn.config, {"state": tk.NORMAL})
         except Exception as e:
             error_msg = f"Error requesting frame capture: {str(e)}"
-            print(f"❌ {error_msg}")
+            logger.error(error_msg)
             messagebox.showerror("Error", error_msg)
 
-    def _register_user(self):
-        """Register the new user in the database and vector store"""
-        print("📋 Starting user registration process")
-        # Get form data
-        full_name = self.name_entry.get().strip()
-        department = self.dept_entry.get().strip()
-        role_selection = self.role_var.get()
-
-        print(
-            f"📄 Form data - Name: {full_name}, Department: {department}, Role: {role_selection}"
-        )
+    def _read_form(self):
+        """Snapshot the form into a plain dict; Tk widgets may only be read on the Tk thread"""
+        return {
+            "full_name": self.name_entry.get().strip(),
+            "department": self.dept_entry.get().strip(),
+            "role_selection": self.role_var.get(),
+        }
 
-        # Validate input
-        if not full_name:
-            print("❌ Validation failed: Full name is required")
-            messagebox.showerror("Validation Error", "Please enter a full name")
-            return
+    def _validate_form(self, form):
+        """Validate a form snapshot and fill in its role_id; returns (title, message) on error, else None"""
+        if not form["full_name"]:
+            return "Validation Error", "Please enter a full name"
 
-        if not role_selection:
-            print("❌ Validation failed: Role selection is required")
-            messagebox.showerror("Validation Error", "Please select a role")
-            return
+        if not form["role_selection"]:
+            return "Validation Error", "Please select a role"
 
         # Extract role ID from selection (format: "Role Name (ID)")
         try:
-            role_id = int(role_selection.split("(")[-1].split(")")[0])
-            print(f"✅ Role ID extracted: {role_id}")
+            form["role_id"] = int(form["role_selection"].split("(")[-1].split(")")[0])
         except (IndexError, ValueError):
-            error_msg = "Invalid role selection"
-            print(f"❌ {error_msg}")
-            messagebox.showerror("Error", error_msg)
+            logger.error("Invalid role selection: %r", form["role_selection"])
+            return "Error", "Invalid role selection"
+        return None
+
+    def _register_user(self):
+        """Register the new user in the database and vector store"""
+        form = self._read_form()
+        logger.debug("Registering user - %s", form)
+
+        error = self._validate_form(form)
+        if error:
+            messagebox.showerror(*error)
             return
 
+        # The pipeline below blocks for hundreds of ms (JPEG encode, inference,
+        # database round trips), so it runs on a worker and the window stays responsive
+        self.register_btn.config(state=tk.DISABLED)
+        self.take_photo_btn.config(state=tk.DISABLED)
+        self.photo_status.config(text="Registering user...")
+        threading.Thread(
+            target=self._register_worker,
+            args=(form, self.captured_frame, self.captured_embedding),
+            daemon=True,
+        ).start()
+        self.window.after(RESULT_POLL_MS, self._poll_registration)
+
+    def _register_worker(self, form, frame, embedding_future):
+        """Save, embed and store the user off the Tk thread, posting the outcome to result_queue"""
+        full_name, department, role_id = form["full_name"], form["department"], form["role_id"]
+        image_path = None
         try:
-            # Save the captured image
-            print("💾 Saving captured image to file system")
-            timestamp = int(time.time())
-            image_filename = f"user_{timestamp}.jpg"
-            image_path = os.path.join("user_images", image_filename)
-            success = cv2.imwrite(image_path, self.captured_frame)
+            # Save the captured image under a random name, which can't collide the way
+            # a per-second timestamp did
+            image_filename = f"user_{uuid.uuid4().hex}.jpg"
+            path = os.path.join("user_images", image_filename)
+            success, jpeg = cv2.imencode(".jpg", frame, JPEG_PARAMS)
 
             if not success:
-                error_msg = "Failed to save user image"
-                print(f"❌ {error_msg}")
-                messagebox.showerror("Error", error_msg)
+                self._fail_registration("Failed to save user image: JPEG encoding failed")
                 return
 
-            print(f"✅ Image saved successfully to {image_path}")
+            # The disk write overlaps with embedding and the database inserts below
+            image_path = path
+            _image_writer.submit(_write_file_atomic, image_path, jpeg.tobytes())
+            logger.debug("Image queued for writing to %s", image_path)
 
             # Generate embedding from the captured frame
-            print("🧠 Generating face embedding from captured frame")
-            embedding = self._generate_embedding(self.captured_frame)
+            # Detection ran when the photo was captured; this only waits if it hasn't finished
+            embedding, face_count = embedding_future.result()
             if embedding is None:
-                error_msg = "Failed to generate face embedding"
-                print(f"❌ {error_msg}")
-                messagebox.showerror("Error", error_msg)
+                self._fail_registration("Failed to generate face embedding", image_path)
                 return
 
-            print("✅ Face embedding generated successfully")
+            # Normalize the embedding in place (float32, one dot product and one scalar sqrt)
+            embedding = np.asarray(embedding, dtype=np.float32)
+            embedding *= 1.0 / math.sqrt(float(np.dot(embedding, embedding)) + 1e-12)
 
-            # Normalize the embedding
-            print("📏 Normalizing embedding vector")
-            embedding = embedding / np.linalg.norm(embedding)
-            print("✅ Embedding normalized")
-
-            # Save user to database
-            print("🗄️ Saving user information to PostgreSQL database")
-            user_id = self._save_user_to_database(
-                full_name, role_id, department, image_path
-            )
-            if user_id is None:
-                error_msg = "Failed to save user to database"
-                print(f"❌ {error_msg}")
-                messagebox.showerror("Error", error_msg)
+            # Refuse to enroll a face the recognizer would already match to someone else
+            existing_user_id = vector_db.find_duplicate(embedding)
+            if existing_user_id is not None:
+                self._fail_registration(
+                    f"This face is already registered (user ID {existing_user_id})", image_path
+                )
                 return
 
-            print(f"✅ User saved to database with ID: {user_id}")
-
-            # Save embedding to vector database
-            print("🔍 Saving embedding to FAISS vector database")
-            faiss_id = self._save_embedding_to_vector_db(embedding, user_id)
-            if faiss_id == -1:
-                error_msg = "Failed to save embedding to vector database"
-                print(f"❌ {error_msg}")
-                messagebox.showerror("Error", error_msg)
+            # The user row and its embedding metadata share one transaction that is only
+            # committed once the FAISS add succeeded, so a failure up to the add leaves no
+            # orphaned user. The vector itself cannot be taken back out of FAISS: if the
+            # commit fails it stays in the in-memory index without metadata (searches skip
+            # it), and a later save of the index would keep it.
+            db_conn = DatabaseConnection()
+            if not db_conn.connect():
+                self._fail_registration("Failed to connect to database", image_path)
                 return
+            try:
+                user_id = self._save_user_to_database(
+                    db_conn, full_name, role_id, department, image_path
+                )
+                if user_id is None:
+                    db_conn.rollback()
+                    self._fail_registration("Failed to save user to database", image_path)
+                    return
+
+                faiss_id = self._save_embedding_to_vector_db(db_conn, embedding, user_id)
+                if faiss_id == -1:
+                    db_conn.rollback()
+                    self._fail_registration(
+                        "Failed to save embedding to vector database", image_path
+                    )
+                    return
 
-            print(f"✅ Embedding saved to vector database with FAISS ID: {faiss_id}")
+                try:
+                    db_conn.commit()
+                except Exception:
+                    logger.exception(
+                        "Commit failed; FAISS ID %s remains in the index without metadata", faiss_id
+                    )
+                    # Don't schedule a save on behalf of a vector that has no metadata
+                    self._fail_registration("Failed to save user to database", image_path)
+                    return
+            finally:
+                db_conn.disconnect()
 
-            print(f"📊 Registration Summary:")
-            print(f"   User ID: {user_id}")
-            print(f"   FAISS ID: {faiss_id}")
-            print(f"   Name: {full_name}")
-            print(f"   Department: {department}")
-            print(f"   Role ID: {role_id}")
-            print(f"   Image: {image_path}")
+            # Write the index in the background; additions in quick succession share one write
+            vector_db.schedule_flush()
 
-            # Immediately fetch and display the stored user details
-            print(
-                "🔍 Fetching registered user details from database for verification..."
+            logger.info(
+                "Registered user %s (%r, department %r, role %s) with FAISS ID %s, image %s",
+                user_id, full_name, department, role_id, faiss_id, image_path,
             )
-            self._fetch_and_display_user(user_id)
+
+            if VERIFY_REGISTRATION:
+                self._fetch_and_display_user(user_id)
+                if not self._verify_embedding_in_vector_db(user_id):
+                    logger.warning("Embedding verification failed - could not find stored embedding")
 
             # Success
             success_msg = f"User '{full_name}' registered successfully!"
-            print(f"🎉 {success_msg}")
-            messagebox.showinfo("Success", success_msg)
-            self.window.destroy()
+            if face_count > 1:
+                success_msg += (
+                    f"\n\nThe photo contained {face_count} faces; the largest one was enrolled. "
+                    "Retake the photo with only this person in frame if that is not them."
+                )
+            self.result_queue.put((True, success_msg))
 
         except Exception as e:
-            error_msg = f"Error registering user: {str(e)}"
-            print(f"❌ {error_msg}")
-            import traceback
-
-            traceback.print_exc()
-            messagebox.showerror("Error", error_msg)
-
-    def _generate_embedding(self, frame):
-        """Generate face embedding from frame"""
-        print("🧠 Starting face embedding generation process")
-        try:
-            # Convert BGR to RGB (InsightFace expects RGB)
-            print("🔄 Converting BGR to RGB color space")
-            img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            print(f"✅ Color conversion completed - image shape: {img_rgb.shape}")
-
-            # Create a temporary embedder instance for generating the embedding
-            print("🔧 Creating temporary FaceEmbedder instance")
-            temp_embedder = FaceEmbedder()
-            print("🔍 Detecting faces and generating embedding using InsightFace")
-            faces = temp_embedder.app.get(img_rgb)
-            print(f"👤 Face detection completed - found {len(faces)} face(s)")
-
-            if len(faces) > 0:
-                embedding = faces[0].embedding
-                print(f"✅ Embedding generated successfully - shape: {embedding.shape}")
-                # Clean up the temporary embedder
-                temp_embedder.stop()
-                return embedding
-            else:
-                print("⚠️ No faces detected in the image")
-                # Clean up the temporary embedder
-                temp_embedder.stop()
-                return None
-        except Exception as e:
-            error_msg = f"Error generating embedding: {e}"
-            print(f"❌ {error_msg}")
-            import traceback
-
-            traceback.print_exc()
-            return None
-
-    def _save_user_to_database(self, full_name, role_id, department, image_path):
-        """Save user details to PostgreSQL database"""
-        print(
-            f"📥 Saving user to database - Name: {full_name}, Role ID: {role_id}, Department: {department}"
-        )
-        try:
-            db_conn = DatabaseConnection()
-            print("🔗 Connecting to PostgreSQL database")
-            if not db_conn.connect():
-                print("❌ Failed to connect to database")
-                return None
-
-            insert_query = """
-                INSERT INTO users (full_name, role_id, department, image_path)
-                VALUES (%s, %s, %s, %s)
-                RETURNING user_id;
-            """
-            print("📤 Executing user insertion query")
-            rows = db_conn.execute_insert_returning(
-                insert_query, (full_name, role_id, department, image_path)
+            # Helpers let unexpected errors propagate here so the trace is logged once
+            self._fail_registration(
+                f"Error registering user: {str(e)}", image_path, exc_info=True
             )
-            db_conn.disconnect()
-            print("🔓 Database connection closed")
-
-            if rows and len(rows) > 0:
-                user_id = rows[0]["user_id"]
-                print(f"✅ User saved successfully with ID: {user_id}")
-
-                # Small delay to ensure database commit
-                import time
 
-                time.sleep(0.1)
-
-                # Immediately verify the user was stored by retrieving it
-                print("🔍 Verifying user storage by retrieving from database...")
-                verification_result = self._verify_user_in_database(user_id)
-                if verification_result:
-                    print(
-                        f"✅ User verification successful - Name: {verification_result['full_name']}, Department: {verification_result['department']}"
-                    )
-                else:
-                    print("⚠️ User verification failed - could not retrieve stored user")
-
-                return user_id
-            else:
-                print("⚠️ No user ID returned from database insertion")
-                return None
-        except Exception as e:
-            error_msg = f"Error saving user to database: {e}"
-            print(f"❌ {error_msg}")
-            import traceback
-
-            traceback.print_exc()
-            return None
-
-    def _verify_user_in_database(self, user_id):
-        """Verify that the user was properly stored by retrieving it"""
-        # Since we just inserted the user, let's try to retrieve it using the same database instance
-        # or at least ensure we're using a fresh connection
+    def _fail_registration(self, error_msg, image_path=None, exc_info=False):
+        """Report a failed registration to the Tk thread and discard its photo"""
+        logger.error(error_msg, exc_info=exc_info)
+        if image_path:
+            # Queued behind the photo write on the single writer thread
+            _image_writer.submit(_remove_file, image_path)
+        self.result_queue.put((False, error_msg))
+
+    def _poll_registration(self):
+        """Report the registration worker's outcome once it arrives (Tk thread)"""
+        if not self.window.winfo_exists():
+            return  # Window was cancelled while the worker was running
         try:
-            from database.db import SecureFaceDB
+            ok, message = self.result_queue.get_nowait()
+        except queue.Empty:
+            self.window.after(RESULT_POLL_MS, self._poll_registration)
+            return
 
-            print("🔍 Verifying user storage by retrieving from database...")
-            with SecureFaceDB() as db:
-                user = db.get_user_by_id(user_id)
+        if ok:
+            messagebox.showinfo("Success", message)
+            self.window.destroy()
+        else:
+            messagebox.showerror("Error", message)
+            self.photo_status.config(text="Registration failed")
+            self.register_btn.config(state=tk.NORMAL)
+            self.take_photo_btn.config(state=tk.NORMAL)
 
-            if user:
-                print(
-                    f"✅ User verified in database - ID: {user['user_id']}, Name: {user['full_name']}"
-                )
-                return user
-            else:
-                print(
-                    f"❌ User not found in database during verification - ID: {user_id}"
-                )
-                # Let's also try to get all users to see if there's a broader issue
-                print("🔍 Getting all users for debugging...")
-                with SecureFaceDB() as db:
-                    all_users = db.get_all_users()
-                if all_users:
-                    print(f"📊 Total users in database: {len(all_users)}")
-                    for u in all_users:
-                        print(f"   - User ID: {u['user_id']}, Name: {u['full_name']}")
-                else:
-                    print("📊 No users found in database")
-                return None
-        except Exception as e:
-            error_msg = f"Error verifying user in database: {e}"
-            print(f"❌ {error_msg}")
-            import traceback
+    def _generate_embedding(self, frame):
+        """
+        Generate the face embedding for the largest face in the frame.
+
+        Returns:
+            (numpy.ndarray or None, int): The embedding (None if no face) and the number of faces found
+        """
+        # Downscale large frames first; the stored photo keeps the full resolution
+        h, w = frame.shape[:2]
+        scale = DETECT_MAX_SIDE / max(h, w)
+        if scale < 1:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        # Convert BGR to RGB (InsightFace expects RGB)
+        img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        # Reuse the shared, already warmed-up embedder instead of reloading the models
+        faces = get_embedder().app.get(img_rgb)
+        logger.debug("Found %d face(s) in %s image", len(faces), img_rgb.shape)
+
+        if len(faces) > 0:
+            # Detection order is arbitrary; the person enrolling is the one closest to the camera
+            largest = max(faces, key=_bbox_area)
+            if len(faces) > 1:
+                logger.warning("%d faces in the captured image, using the largest", len(faces))
+            return largest.embedding, len(faces)
+        else:
+            logger.warning("No faces detected in the captured image")
+            return None, 0
+
+    def _save_user_to_database(self, db_conn, full_name, role_id, department, image_path):
+        """Insert the user row inside db_conn's open transaction; returns the new user_id"""
+        insert_query = """
+            INSERT INTO users (full_name, role_id, department, image_path)
+            VALUES (%s, %s, %s, %s)
+            RETURNING user_id;
+        """
+        rows = db_conn.execute_in_transaction(
+            insert_query, (full_name, role_id, department, image_path)
+        )
 
-            traceback.print_exc()
+        if rows and len(rows) > 0:
+            user_id = rows[0]["user_id"]
+            logger.debug("User staged with ID %s", user_id)
+            return user_id
+        else:
+            logger.warning("No user ID returned from database insertion")
             return None
 
-    def _save_embedding_to_vector_db(self, embedding, user_id):
-        """Save embedding to FAISS vector database"""
-        print(f"📥 Saving embedding to vector database for user ID: {user_id}")
-        try:
-            # Add embedding to FAISS index
-            faiss_id = vector_db.add_embedding(embedding, user_id)
-            print(f"🔍 FAISS add_embedding returned ID: {faiss_id}")
-
-            # Save the index
-            print("💾 Saving FAISS index to file")
-            vector_db.save_index("faiss_index.bin")
-            print("✅ FAISS index saved successfully")
-
-            # Verify the embedding was stored by searching for it
-            if faiss_id != -1:
-                print(
-                    "🔍 Verifying embedding storage by searching in vector database..."
-                )
-                verification_result = self._verify_embedding_in_vector_db(user_id)
-                if verification_result:
-                    print(
-                        f"✅ Embedding verification successful"
-                    )
-                else:
-                    print(
-                        "⚠️ Embedding verification failed - could not find stored embedding"
-                    )
-
-            return faiss_id
-        except Exception as e:
-            error_msg = f"Error saving embedding to vector database: {e}"
-            print(f"❌ {error_msg}")
-            import traceback
-
-            traceback.print_exc()
-            return -1
+    def _save_embedding_to_vector_db(self, db_conn, embedding, user_id):
+        """Add the embedding to FAISS, staging its metadata in db_conn's open transaction"""
+        faiss_id = vector_db.add_embedding(embedding, user_id, db_conn=db_conn)
+        logger.debug("FAISS add_embedding returned ID %s for user %s", faiss_id, user_id)
+        return faiss_id
 
     def _verify_embedding_in_vector_db(self, user_id):
         """Verify that the embedding was properly stored by checking index stats"""
         try:
             # Check the index stats to verify the embedding was added
             stats = vector_db.get_index_stats()
-            print(f"📊 Vector database stats after insertion: {stats}")
+            logger.debug("Vector database stats after insertion: %s", stats)
 
             # If we have at least one vector, assume it worked
-            if stats.get("initialized", False) and stats.get("total_vectors", 0) > 0:
-                print(
-                    f"✅ Vector database verification successful - total vectors: {stats.get('total_vectors')}"
-                )
-                return True
-            else:
-                print("⚠️ Vector database verification failed - no vectors found")
-                return False
+            return stats.get("initialized", False) and stats.get("total_vectors", 0) > 0
         except Exception as e:
-            error_msg = f"Error verifying embedding in vector database: {e}"
-            print(f"❌ {error_msg}")
+            logger.error("Error verifying embedding in vector database: %s", e)
             return False
 
     def _fetch_and_display_user(self, user_id):
         """Fetch and display user details from database for verification"""
         try:
-            from database.db import SecureFaceDB
-
-            print(f"📥 Fetching user details for ID: {user_id}")
             with SecureFaceDB() as db:
                 user = db.get_user_by_id(user_id)
 
             if user:
-                print("✅ User details retrieved successfully:")
-                print(f"   User ID: {user['user_id']}")
-                print(f"   Full Name: {user['full_name']}")
-                print(f"   Role ID: {user['role_id']}")
-                print(f"   Department: {user['department']}")
-                print(f"   Image Path: {user['image_path']}")
-                print(f"   Created At: {user['created_at']}")
-                print(f"   Updated At: {user['updated_at']}")
+                logger.info(
+                    "Stored user %s: name=%r role_id=%s department=%r image=%s created=%s updated=%s",
+                    user["user_id"], user["full_name"], user["role_id"], user["department"],
+                    user["image_path"], user["created_at"], user["updated_at"],
+                )
             else:
-                print(f"❌ Failed to retrieve user details for ID: {user_id}")
+                logger.error("Failed to retrieve user details for ID: %s", user_id)
 
-        except Exception as e:
-            error_msg = f"Error fetching user details: {e}"
-            print(f"❌ {error_msg}")
-            import traceback
-
-            traceback.print_exc()
+        except Exception:
+            # Debug read-back only; the user is already committed
+            logger.exception("Error fetching user details for ID %s", user_id)
 
     def _cancel_registration(self):
         """Cancel the registration and close the window"""
         self.window.destroy()
 
     def set_captured_frame(self, frame):
-        """Set the captured frame and update UI"""
-        print(
-            f"📥 Received captured frame in registration window - shape: {frame.shape}"
+        """
+        Set the captured frame and update UI.
+        The frame must be owned by the caller (UIController copies it off the stream's
+        ring buffer before queueing it), so it is stored without another copy.
+        """
+        logger.debug("Received captured frame - shape: %s", frame.shape)
+        self.captured_frame = frame
+        self.captured_embedding = _embed_executor.submit(
+            self._generate_embedding, self.captured_frame
         )
-        self.captured_frame = frame.copy()
-        print("✅ Frame copied and stored for registration")
         self.photo_status.config(text="Photo captured successfully!")
         self.register_btn.config(state=tk.NORMAL)
-        print("🔄 UI updated: photo status changed and register button enabled")
-
@@ -1,7 +1,10 @@
-import faiss
 import numpy as np
-import time
+import math
 import os # Import os for path checking
+import atexit
+import threading
+import time
+from contextlib import contextmanager
 # Import the DatabaseConnection class
 from database.connection import DatabaseConnection
 import logging
@@ -10,116 +13,656 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class _RWLock:
+    """
+    Reader-writer lock: any number of readers, or one writer. Waiting writers
+    block new readers so a steady search load cannot starve an addition.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+# faiss is imported on first use by _faiss(): loading it pulls in BLAS/OpenMP,
+# which utilities that import this module without touching the index don't need
+faiss = None
+
 # Global variables for the FAISS index and ID counter
 index = None
 dimension = 512  # ArcFace embedding dimension
-next_embedding_id = 0  # Simple in-memory ID counter, consider persistence
+next_embedding_id = 0  # ID FAISS assigns to the next vector; persisted in faiss_state
+nprobe = 16  # Inverted lists visited per query on IVF indexes
+read_only = False  # True when the index is memory-mapped from disk
+can_reconstruct = True  # Whether the current index supports reconstruct(); set by _prepare_index()
+index_file = None  # Path the index was loaded from / last saved to; target of flush()
+dirty = False  # True when the in-memory index has additions not yet written to index_file
+_flush_timer = None
+_flush_lock = threading.Lock()
+
+# FAISS indexes are safe for concurrent searches but not for a search racing an add:
+# searches, reconstructs and saves take the read side, index.add() the write side
+_index_lock = _RWLock()
+
+# Serializes additions only: an ID is taken from ntotal and its metadata staged before
+# index.add() assigns it, and that database round trip must not block searches
+_add_lock = threading.Lock()
 
-def init_index(dim=512, index_path=None):
+# Per-thread scratch arrays for single queries and search results, reused across
+# searches so the recognition loop doesn't allocate on every frame
+_search_buffers = threading.local()
+
+# Seconds schedule_flush() waits before writing, so a burst of additions costs one write
+FLUSH_DELAY = 5.0
+
+# embedding_id -> (user_id, created_at); mirrors embeddings_metadata so searches
+# normally resolve their hits without a database round trip
+_metadata_cache = {}
+
+# Seconds the cache is trusted before it is dropped and refilled on demand, so rows
+# deleted by another process (faiss_cli remove / remove_user) stop matching
+METADATA_CACHE_TTL = 60.0
+_metadata_cache_expires = 0.0  # time.monotonic() deadline of the current cache contents
+
+# Set once embeddings_metadata is known to exist, so re-initializing skips the DDL
+_META_TABLE_READY = False
+
+# True after init_index(defer_schema=True) until the first addition creates the schema
+_schema_deferred = False
+_schema_lock = threading.Lock()
+
+# Upserts the persisted ID counter; prefixed to the metadata INSERTs as a CTE so the
+# counter and the rows it covers are written by the same statement
+_NEXT_ID_UPSERT_CTE = """
+WITH next_id AS (
+    INSERT INTO faiss_state (key, value) VALUES ('next_embedding_id', {next_id})
+    ON CONFLICT (key) DO UPDATE SET value = GREATEST(faiss_state.value, EXCLUDED.value)
+)
+"""
+
+# New indexes store vectors as FP16, halving memory and scan bandwidth vs. FP32
+NEW_INDEX_FACTORY = "SQfp16"
+
+# Shorthand names accepted by rebuild_index() in place of an index_factory string.
+# "int8" trains per-dimension ranges on the stored (L2-normalized) embeddings and
+# keeps 1 byte per dimension; distances stay in the original float space so
+# recognition thresholds are unaffected.
+# "hnsw" builds an HNSW graph over FP16 vectors: sub-linear search without training,
+# and reconstruct() still works. Vectors keep their sequential FAISS IDs.
+# "fastscan" is sized from the gallery by fastscan_index_factory().
+INDEX_PRESETS = {
+    "fp16": "SQfp16",
+    "int8": "SQ8",
+    "hnsw": "HNSW32,SQfp16",
+}
+FASTSCAN_PRESET = "fastscan"
+
+HNSW_EF_CONSTRUCTION = 100  # Candidate list size while inserting into an HNSW graph
+HNSW_EF_SEARCH = 64  # Candidate list size per HNSW query (recall vs. latency)
+
+# Index distance below which a new embedding is treated as an already-enrolled face.
+# Matches the FrameProcessor default recognition_threshold: anything closer would be
+# recognized as the existing user anyway.
+DUPLICATE_DISTANCE = 1.0
+
+# Galleries smaller than this are scanned linearly; larger ones can be rebuilt into IVFPQ
+IVF_MIN_VECTORS = 10000
+IVF_MAX_NLIST = 4096
+IVF_TRAIN_POINTS_PER_LIST = 39  # FAISS warns below this many training points per list
+REFINE_K_FACTOR = 4  # Compressed candidates re-ranked exactly per requested neighbor
+
+def _faiss():
+    """Imports faiss on first use and returns the module."""
+    global faiss
+    if faiss is None:
+        import faiss as faiss_module
+        faiss = faiss_module
+    return faiss
+
+def init_index(dim=512, index_path=None, mmap=False, defer_schema=False):
     """
     Initializes the FAISS index.
     If index_path is provided, it attempts to load the index from that path.
     Otherwise, it creates a new index.
+
+    With mmap=True the index file is memory-mapped read-only, so the OS pages in
+    only what searches touch and concurrent processes share the page cache.
+    Embeddings cannot be added to a memory-mapped index.
+
+    With defer_schema=True no database work is done here: the metadata tables are
+    created on the first addition, and searches fetch metadata for their hits on demand.
     """
-    global index, dimension, next_embedding_id
+    global index, dimension, next_embedding_id, read_only, index_file, dirty, _schema_deferred
+    _faiss()
     dimension = dim
+    read_only = False
+    dirty = False
+    index_file = index_path
+    _metadata_cache.clear()
     if index_path and os.path.exists(index_path):
-        logger.info(f"Loading FAISS index from {index_path}")
-        index = faiss.read_index(index_path)
-        # Determine the next ID to use. This is a simplification.
-        # In practice, you might want to store the next ID persistently or
-        # derive it from the index contents/max ID.
-        # For IVF, you might need to check ntotal or stored vectors.
+        logger.info(f"Loading FAISS index from {index_path}{' (mmap)' if mmap else ''}")
+        index = None
+        if mmap:
+            try:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                read_only = True
+            except RuntimeError as e:
+                logger.warning(f"Index type does not support mmap, loading into memory: {e}")
+        if index is None:
+            index = faiss.read_index(index_path)
+        # FAISS numbers vectors sequentially, so the next ID is ntotal; the persisted
+        # counter in faiss_state is checked against it once the database is reached
         next_embedding_id = index.ntotal
+        _prepare_index(index)
         logger.info(f"Loaded index with {index.ntotal} vectors. Next ID set to {next_embedding_id}")
     else:
-        logger.info("Creating new FAISS index")
-        # Using IndexFlatL2 for simplicity. Consider IndexIVFFlat for larger datasets.
-        index = faiss.IndexFlatL2(dimension)
+        logger.info(f"Creating new FAISS index ({NEW_INDEX_FACTORY})")
+        # FP16 scalar quantizer needs no training and still supports reconstruct().
+        # Use rebuild_index() to switch to IVFPQ once the gallery grows large.
+        index = faiss.index_factory(dimension, NEW_INDEX_FACTORY)
+        _prepare_index(index)
         next_embedding_id = 0
 
-    # Ensure the metadata table exists in PostgreSQL
-    _create_metadata_table()
+    _schema_deferred = defer_schema
+    if defer_schema:
+        return
+
+    # Ensure the metadata table exists in PostgreSQL, and cache the rows of a loaded index
+    _create_metadata_table(warm_cache=index.ntotal > 0)
+
+def _ensure_deferred_schema():
+    """Creates the metadata tables postponed by init_index(defer_schema=True), once."""
+    global _schema_deferred
+    if not _schema_deferred:
+        return
+    with _schema_lock:
+        if _schema_deferred:
+            _create_metadata_table()
+            _schema_deferred = False
+
+def _get_ivf(idx):
+    """Returns the IVF component of an index, or None for non-IVF indexes."""
+    try:
+        return faiss.extract_index_ivf(idx)
+    except RuntimeError:
+        return None
+
+def _get_hnsw(idx):
+    """Returns the index as an IndexHNSW, or None for non-HNSW indexes."""
+    idx = faiss.downcast_index(idx)
+    return idx if isinstance(idx, faiss.IndexHNSW) else None
+
+def _prepare_index(idx):
+    """
+    Applies search parameters, enables reconstruction on IVF indexes and records
+    whether the index can reconstruct stored vectors.
+    """
+    global can_reconstruct
+    hnsw = _get_hnsw(idx)
+    if hnsw is not None:
+        hnsw.hnsw.efSearch = HNSW_EF_SEARCH
+    ivf = _get_ivf(idx)
+    if ivf is not None:
+        # IVF indexes need a direct map for reconstruct() (used by get_template_embedding)
+        ivf.make_direct_map()
+        faiss.ParameterSpace().set_index_parameter(idx, "nprobe", nprobe)
+    if isinstance(idx, faiss.IndexRefine):
+        idx.k_factor = REFINE_K_FACTOR
+    can_reconstruct = _probe_reconstruct(idx)
+
+def _probe_reconstruct(idx):
+    """Checks once whether reconstruct() works on the index, instead of on every template lookup."""
+    if idx.ntotal == 0:
+        return True  # Nothing to probe; every index type built here supports it
+    try:
+        idx.reconstruct(0)
+        return True
+    except RuntimeError:
+        return False
+
+def set_nprobe(value):
+    """Sets how many inverted lists are visited per query (no-op for flat indexes)."""
+    global nprobe
+    nprobe = int(value)
+    if index is not None and _get_ivf(index) is not None:
+        faiss.ParameterSpace().set_index_parameter(index, "nprobe", nprobe)
+
+def set_num_threads(num_threads):
+    """Sets the number of OpenMP threads FAISS uses for search."""
+    _faiss().omp_set_num_threads(max(1, int(num_threads)))
+
+def suggest_index_factory(ntotal):
+    """
+    Suggests a FAISS index_factory string for a gallery of the given size.
+    Small galleries use a linear FP16 scan; larger ones use OPQ + IVF (HNSW coarse quantizer) +
+    4-bit fast-scan PQ, whose packed code layout is scanned with SIMD shuffles. The
+    PQ shortlist is then re-ranked against FP16 copies of the vectors (Refine), which
+    FAISS does in its own SIMD distance kernels.
+    """
+    if ntotal < IVF_MIN_VECTORS:
+        return NEW_INDEX_FACTORY
+    return fastscan_index_factory(ntotal)
+
+def fastscan_index_factory(ntotal):
+    """
+    Returns the OPQ + IVF + 4-bit fast-scan PQ + Refine(SQfp16) factory string, with
+    nlist sized so every inverted list gets enough training points for ntotal vectors.
+    """
+    max_nlist = max(1, ntotal // IVF_TRAIN_POINTS_PER_LIST)
+    nlist = min(IVF_MAX_NLIST, 2 ** int(math.log2(max_nlist)))
+    return f"OPQ32_128,IVF{nlist}_HNSW32,PQ32x4fsr,Refine(SQfp16)"
+
+def rebuild_index(index_factory=None, index_path=None, max_train_vectors=100000):
+    """
+    Rebuilds the current index into the given index_factory type, training it on
+    a sample of the stored embeddings. FAISS IDs are preserved since vectors are
+    re-added in their original order.
+
+    Args:
+        index_factory (str): FAISS index_factory string, INDEX_PRESETS name or "fastscan",
+            defaults to suggest_index_factory().
+        index_path (str): If provided, the rebuilt index is saved to this path.
+        max_train_vectors (int): Maximum number of stored vectors used for training.
+
+    Returns:
+        bool: True if the index was rebuilt, False on error.
+    """
+    global index, read_only
+
+    if index is None or index.ntotal == 0:
+        logger.error("FAISS index is not initialized or is empty. Nothing to rebuild.")
+        return False
+
+    index_factory = index_factory or suggest_index_factory(index.ntotal)
+    if index_factory == FASTSCAN_PRESET:
+        index_factory = fastscan_index_factory(index.ntotal)
+    index_factory = INDEX_PRESETS.get(index_factory, index_factory)
+    try:
+        # Searches keep running on the old index; additions wait so none are lost in the swap
+        with _index_lock.read():
+            vectors = index.reconstruct_n(0, index.ntotal)
+            new_index = faiss.index_factory(dimension, index_factory)
+            hnsw = _get_hnsw(new_index)
+            if hnsw is not None:
+                hnsw.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+
+            if not new_index.is_trained:
+                if vectors.shape[0] > max_train_vectors:
+                    sample_ids = np.random.choice(vectors.shape[0], max_train_vectors, replace=False)
+                    train_vectors = vectors[sample_ids]
+                else:
+                    train_vectors = vectors
+                logger.info(f"Training {index_factory} index on {train_vectors.shape[0]} vectors")
+                new_index.train(train_vectors)
+
+            new_index.add(vectors)
+            _prepare_index(new_index)
+            index = new_index
+            read_only = False
+        logger.info(f"Rebuilt FAISS index as {index_factory} with {index.ntotal} vectors")
+    except Exception as e:
+        logger.error(f"Error rebuilding FAISS index as {index_factory}: {e}")
+        return False
+
+    if index_path:
+        save_index(index_path)
+    return True
+
+def normalize_embeddings(embeddings):
+    """
+    L2-normalizes a batch of embeddings in a single vectorized pass.
+
+    Args:
+        embeddings (np.ndarray): An (n, d) array of embeddings.
+
+    Returns:
+        np.ndarray: An (n, d) float32 array of unit-length rows. All-zero rows are left unchanged.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.einsum('ij,ij->i', embeddings, embeddings)
+    np.sqrt(norms, out=norms)
+    norms[norms == 0] = 1.0
+    return embeddings / norms[:, None]
+
+def _create_metadata_table(warm_cache=False):
+    """
+    Creates the metadata and faiss_state tables in PostgreSQL if they don't exist and
+    checks the persisted embedding ID counter against the index.
+    With warm_cache=True the table is also loaded into the metadata cache on the same connection.
+    Once the tables are known to exist, only the warm-up (if requested) touches the database.
+    """
+    if _META_TABLE_READY and not warm_cache:
+        return
 
-def _create_metadata_table():
-    """Creates the metadata table in PostgreSQL if it doesn't exist."""
     db_conn = DatabaseConnection()
     if not db_conn.connect():
         logger.error("Failed to connect to database for creating metadata table.")
         return
 
     try:
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS embeddings_metadata (
-            embedding_id INTEGER PRIMARY KEY, -- FAISS internal ID
-            user_id INTEGER NOT NULL,
-            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-            -- FOREIGN KEY (user_id) REFERENCES users(user_id) -- Uncomment if you have a users table
-        );
-        """
-        if db_conn.execute_update(create_table_query):
-            logger.info("Ensured embeddings_metadata table exists")
-        else:
-            logger.error("Failed to create embeddings_metadata table")
+        if not _META_TABLE_READY:
+            _ensure_metadata_table(db_conn)
+        if warm_cache:
+            _warm_metadata_cache(db_conn)
+        _check_next_embedding_id(db_conn)
     finally:
         db_conn.disconnect()
 
-def add_embedding(vector, user_id):
+def _ensure_metadata_table(db_conn):
+    """Runs the embeddings_metadata and faiss_state DDL and marks them ready on success."""
+    global _META_TABLE_READY
+
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS embeddings_metadata (
+        embedding_id INTEGER PRIMARY KEY, -- FAISS internal ID
+        user_id INTEGER NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        -- FOREIGN KEY (user_id) REFERENCES users(user_id) -- Uncomment if you have a users table
+    );
+    -- Serves "latest embedding of a user" lookups (get_template_embedding) as an index-only scan
+    CREATE INDEX IF NOT EXISTS idx_meta_user_created
+        ON embeddings_metadata (user_id, created_at DESC) INCLUDE (embedding_id);
+    CREATE TABLE IF NOT EXISTS faiss_state (
+        key TEXT PRIMARY KEY,
+        value BIGINT NOT NULL
+    );
+    """
+    if db_conn.execute_update(create_table_query):
+        _META_TABLE_READY = True
+        logger.info("Ensured embeddings_metadata and faiss_state tables exist")
+    else:
+        logger.error("Failed to create embeddings_metadata and faiss_state tables")
+
+def _check_next_embedding_id(db_conn):
+    """
+    Compares the persisted next_embedding_id with the index. A larger stored value means
+    embeddings were committed that the loaded index file does not contain, and new
+    additions would reuse their IDs.
+    """
+    rows = db_conn.execute_query("SELECT value FROM faiss_state WHERE key = 'next_embedding_id';")
+    if not rows:
+        return
+    stored_next_id = rows[0]['value']
+    if stored_next_id != next_embedding_id:
+        logger.warning(
+            f"Persisted next_embedding_id is {stored_next_id} but the index holds {next_embedding_id} vectors; "
+            "the index file is out of sync with embeddings_metadata"
+        )
+
+def add_embedding(vector, user_id, db_conn=None):
     """
     Adds a single embedding vector to the FAISS index and its metadata to PostgreSQL.
 
     Args:
         vector (np.ndarray): The 512-D embedding vector.
         user_id (int): The ID of the user this embedding belongs to.
+        db_conn (DatabaseConnection): If given, the metadata row is written inside this
+            connection's open transaction and left for the caller to commit or roll back.
 
     Returns:
         int: The ID assigned to the embedding by FAISS, or -1 on error.
     """
-    global index, next_embedding_id
+    global index, next_embedding_id, dirty
 
     if index is None:
         logger.error("FAISS index is not initialized. Call init_index() first.")
         return -1
 
+    if read_only:
+        logger.error("FAISS index is memory-mapped read-only. Call init_index() without mmap to add embeddings.")
+        return -1
+
     if vector.shape[0] != dimension:
         logger.error(f"Embedding dimension mismatch. Expected {dimension}, got {vector.shape[0]}")
         return -1
 
+    _ensure_deferred_schema()
+
+    if db_conn is None:
+        # Standalone add: a batch of one, committed on its own connection
+        faiss_ids = add_embeddings_batch(vector.reshape(1, -1), [user_id])
+        return faiss_ids[0] if faiss_ids else -1
+
     try:
-        # Add vector to FAISS index
-        # FAISS assigns an internal ID based on the order of insertion (0, 1, 2, ...)
-        faiss_id = int(index.ntotal) # ID that FAISS will assign - convert to Python int
-        vector_float32 = vector.astype(np.float32).reshape(1, -1)
-        index.add(vector_float32)
-        logger.info(f"Added vector to FAISS index with ID {faiss_id}")
-
-        # Store metadata in PostgreSQL
+        # No copy when the embedding is already contiguous float32 (astype always copied)
+        vector_float32 = np.ascontiguousarray(vector, dtype=np.float32).reshape(1, -1)
+
+        # The ID is taken from ntotal, so reading it and adding must not interleave with another add
+        with _add_lock:
+            # Add vector to FAISS index
+            # FAISS assigns an internal ID based on the order of insertion (0, 1, 2, ...)
+            faiss_id = int(index.ntotal) # ID that FAISS will assign - convert to Python int
+
+            # Stage the metadata and the ID counter first so a failed FAISS add only needs a rollback.
+            # This round trip runs outside _index_lock, so searches continue meanwhile.
+            db_conn.execute_in_transaction(
+                _NEXT_ID_UPSERT_CTE.format(next_id=faiss_id + 1)
+                + "INSERT INTO embeddings_metadata (embedding_id, user_id) VALUES (%s, %s);",
+                (faiss_id, int(user_id)),
+            )
+            with _index_lock.write():
+                index.add(vector_float32)
+                next_embedding_id = faiss_id + 1
+                dirty = True
+        logger.info(f"Added vector to FAISS index with ID {faiss_id} (metadata pending commit)")
+        return faiss_id
+
+    except Exception as e:
+        logger.error(f"Error adding vector to FAISS index: {e}")
+        return -1
+
+def add_embeddings_batch(vectors, user_ids, db_conn=None):
+    """
+    Adds a batch of embedding vectors to the FAISS index in one call and stores
+    their metadata with a single multi-row INSERT.
+
+    The metadata is staged before the FAISS add, so a failed add only needs a rollback.
+
+    Args:
+        vectors (np.ndarray): An (n, 512) array of embeddings.
+        user_ids (list): The n user IDs the embeddings belong to, in the same order.
+        db_conn (DatabaseConnection): If given, the metadata rows are written inside this
+            connection's open transaction and left for the caller to commit or roll back.
+            Otherwise they are committed here on a pooled connection.
+
+    Returns:
+        list: The FAISS IDs assigned to the embeddings, or an empty list on error.
+    """
+    global next_embedding_id, dirty
+
+    if index is None:
+        logger.error("FAISS index is not initialized. Call init_index() first.")
+        return []
+
+    if read_only:
+        logger.error("FAISS index is memory-mapped read-only. Call init_index() without mmap to add embeddings.")
+        return []
+
+    # One C-contiguous float32 block lets FAISS process the whole batch in its SIMD kernels
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors.ndim != 2 or vectors.shape[1] != dimension:
+        logger.error(f"Embedding batch shape mismatch. Expected (n, {dimension}), got {vectors.shape}")
+        return []
+    if len(user_ids) != vectors.shape[0]:
+        logger.error(f"Got {vectors.shape[0]} embeddings but {len(user_ids)} user IDs")
+        return []
+
+    _ensure_deferred_schema()
+
+    own_conn = db_conn is None
+    if own_conn:
         db_conn = DatabaseConnection()
         if not db_conn.connect():
             logger.error("Failed to connect to database for adding embedding metadata.")
-            return -1
+            return []
 
+    try:
         try:
-            insert_metadata_query = """
-            INSERT INTO embeddings_metadata (embedding_id, user_id, created_at)
-            VALUES (%s, %s, %s);
-            """
-            timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-            # Convert types to ensure compatibility with PostgreSQL
-            faiss_id = int(faiss_id)
-            user_id = int(user_id)
-            if db_conn.execute_update(insert_metadata_query, (faiss_id, user_id, timestamp)):
-                logger.info(f"Stored metadata for embedding ID {faiss_id}, user ID {user_id}")
-                return faiss_id
-            else:
-                logger.error(f"Failed to store metadata for embedding ID {faiss_id}")
-                return -1
-        finally:
+            with _add_lock:
+                # FAISS assigns sequential IDs starting at the current ntotal
+                first_id = int(index.ntotal)
+                faiss_ids = list(range(first_id, first_id + vectors.shape[0]))
+
+                # One multi-row INSERT that also advances the persisted ID counter;
+                # created_at comes from the column's server-side default
+                insert_metadata_query = _NEXT_ID_UPSERT_CTE.format(next_id=faiss_ids[-1] + 1) + """
+                INSERT INTO embeddings_metadata (embedding_id, user_id) VALUES %s
+                RETURNING embedding_id, user_id, created_at;
+                """
+                rows = [(faiss_id, int(user_id)) for faiss_id, user_id in zip(faiss_ids, user_ids)]
+                inserted = db_conn.execute_values_in_transaction(insert_metadata_query, rows, fetch=True)
+
+                with _index_lock.write():
+                    index.add(vectors)
+                    next_embedding_id = faiss_ids[-1] + 1
+                    dirty = True
+            logger.info(f"Added {len(faiss_ids)} vectors to FAISS index with IDs {first_id}..{faiss_ids[-1]}")
+        except Exception as e:
+            logger.error(f"Error adding vector batch to FAISS index: {e}")
+            if own_conn:
+                db_conn.rollback()
+            return []
+
+        if not own_conn:
+            # The caller commits; searches fetch the rows on demand once they are visible
+            return faiss_ids
+
+        try:
+            db_conn.commit()
+        except Exception as e:
+            # The vectors are already in the index and FAISS cannot drop them without renumbering
+            logger.error(
+                f"Failed to commit metadata for FAISS IDs {first_id}..{faiss_ids[-1]}; "
+                f"these vectors remain in the index without metadata: {e}"
+            )
+            return []
+
+        for row in inserted:
+            _metadata_cache[row['embedding_id']] = (row['user_id'], row['created_at'])
+        logger.info(f"Stored metadata for {len(rows)} embeddings")
+        return faiss_ids
+    finally:
+        if own_conn:
             db_conn.disconnect()
 
+def register_users_bulk(users):
+    """
+    Registers many users at once: one multi-row INSERT for the user rows, one
+    FAISS add for their embeddings and a single index save at the end.
+    The user rows and the embedding metadata share one transaction that is only
+    committed after the FAISS add, so a failed batch leaves no users without embeddings.
+
+    Args:
+        users (list): (full_name, role_id, department, image_path, embedding) tuples.
+
+    Returns:
+        list: The new user IDs in input order, or an empty list on error.
+    """
+    if not users:
+        return []
+
+    logger.info(f"Registering {len(users)} users in bulk")
+    db_conn = DatabaseConnection()
+    if not db_conn.connect():
+        logger.error("Failed to connect to database for bulk registration.")
+        return []
+    try:
+        user_ids = _stage_users_bulk(db_conn, [user[:4] for user in users])
+        if not user_ids:
+            db_conn.rollback()
+            logger.error("Bulk user insert failed")
+            return []
+
+        embeddings = normalize_embeddings(np.stack([user[4] for user in users]))
+        faiss_ids = add_embeddings_batch(embeddings, user_ids, db_conn=db_conn)
+        if not faiss_ids:
+            db_conn.rollback()
+            logger.error("Failed to save bulk embeddings to vector database")
+            return []
+
+        try:
+            db_conn.commit()
+        except Exception as e:
+            # The vectors are already in the index; don't save it on their behalf
+            logger.error(
+                f"Failed to commit bulk registration; FAISS IDs {faiss_ids[0]}..{faiss_ids[-1]} "
+                f"remain in the index without metadata: {e}"
+            )
+            return []
     except Exception as e:
-        logger.error(f"Error adding vector to FAISS index: {e}")
-        return -1
+        db_conn.rollback()
+        logger.error(f"Bulk registration failed: {e}")
+        return []
+    finally:
+        db_conn.disconnect()
+
+    flush()
+    logger.info(f"Registered {len(user_ids)} users in bulk")
+    return user_ids
+
+def _stage_users_bulk(db_conn, users):
+    """
+    Inserts user rows inside db_conn's open transaction with one multi-row INSERT;
+    users are (full_name, role_id, department, image_path) tuples. Returns the new user IDs.
+    """
+    insert_query = """
+    INSERT INTO users (full_name, role_id, department, image_path)
+    VALUES %s
+    RETURNING user_id;
+    """
+    rows = db_conn.execute_values_in_transaction(insert_query, users, fetch=True)
+    return [row['user_id'] for row in rows]
+
+def find_duplicate(query_vector, threshold=DUPLICATE_DISTANCE, k=5):
+    """
+    Checks whether a face is already enrolled.
+
+    Args:
+        query_vector (np.ndarray): The normalized 512-D embedding to check.
+        threshold (float): Index distance below which a stored embedding counts as the same face.
+        k (int): Neighbors examined, so template entries (negative user IDs) can be skipped.
+
+    Returns:
+        int or None: The user_id of the nearest enrolled match, or None if there is none.
+    """
+    # FAISS scans the stored codes with its own SIMD distance kernels, so the check
+    # runs against the live index without keeping a separate float32 copy of the gallery
+    for faiss_id, distance, user_id, created_at in search_embeddings(query_vector, k=k):
+        if distance >= threshold:
+            break  # Results are sorted by distance
+        if user_id >= 0:
+            return user_id
+    return None
 
 def search_embeddings(query_vector, k=5):
     """
@@ -133,73 +676,216 @@ def search_embeddings(query_vector, k=5):
         list: A list of tuples (faiss_id, distance, user_id, created_at) for the k nearest neighbors,
               or an empty list on error.
     """
+    if query_vector.shape[0] != dimension:
+        logger.error(f"Query vector dimension mismatch. Expected {dimension}, got {query_vector.shape[0]}")
+        return []
+
+    if query_vector.dtype != np.float32 or not query_vector.flags.c_contiguous:
+        # Convert into this thread's scratch row instead of a fresh array
+        query = getattr(_search_buffers, "query", None)
+        if query is None or query.shape[1] != dimension:
+            query = _search_buffers.query = np.empty((1, dimension), dtype=np.float32)
+        np.copyto(query[0], query_vector, casting='unsafe')
+        query_vector = query
+
+    results = search_embeddings_batch(query_vector.reshape(1, -1), k)
+    return results[0] if results else []
+
+def search_embeddings_batch(query_vectors, k=5):
+    """
+    Searches for the k most similar embeddings of several queries with a single
+    FAISS call, so the distance computation runs as one BLAS/SIMD batch.
+
+    Args:
+        query_vectors (np.ndarray): An (nq, 512) array of query embeddings.
+        k (int): The number of nearest neighbors to search for per query.
+
+    Returns:
+        list: One list of (faiss_id, distance, user_id, created_at) tuples per query,
+              or an empty list on error.
+    """
+    hits = search_ids_batch(query_vectors, k)
+    if not hits:
+        return []
+
+    # IDs from all queries share one metadata lookup
+    metadata = get_metadata({faiss_id for query_hits in hits for faiss_id, _ in query_hits})
+
+    # Assemble in FAISS order (nearest first)
+    results = []
+    for query_hits in hits:
+        query_results = []
+        for faiss_id, distance in query_hits:
+            if faiss_id in metadata:
+                user_id, created_at = metadata[faiss_id]
+                query_results.append((faiss_id, distance, user_id, created_at))
+            else:
+                logger.warning(f"No metadata found for FAISS ID {faiss_id}")
+        results.append(query_results)
+
+    return results
+
+def search_ids_batch(query_vectors, k=5):
+    """
+    Searches the FAISS index only, without touching the metadata. Callers that just
+    compare distances against a threshold can resolve the winner with get_metadata().
+
+    Args:
+        query_vectors (np.ndarray): An (nq, 512) array of query embeddings.
+        k (int): The number of nearest neighbors to search for per query.
+
+    Returns:
+        list: One list of (faiss_id, distance) tuples per query, nearest first,
+              or an empty list on error.
+    """
     global index
 
     if index is None or index.ntotal == 0:
         logger.warning("FAISS index is not initialized or is empty.")
         return []
 
-    if query_vector.shape[0] != dimension:
-        logger.error(f"Query vector dimension mismatch. Expected {dimension}, got {query_vector.shape[0]}")
+    # No copy when the queries are already contiguous float32 (astype always copied)
+    query_vectors = np.ascontiguousarray(query_vectors, dtype=np.float32)
+    if query_vectors.ndim != 2 or query_vectors.shape[1] != dimension:
+        logger.error(f"Query batch shape mismatch. Expected (nq, {dimension}), got {query_vectors.shape}")
         return []
 
     try:
-        query_vector_float32 = query_vector.astype(np.float32).reshape(1, -1)
-        distances, indices = index.search(query_vector_float32, k)
-        logger.info(f"Search completed, found {len(indices[0])} results")
+        distances, indices = _result_buffers(query_vectors.shape[0], k)
+        with _index_lock.read():
+            index.search(query_vectors, k, D=distances, I=indices)
+        logger.info(f"Search completed for {len(indices)} queries")
 
-        results = []
-        db_conn = DatabaseConnection()
-        if not db_conn.connect():
-            logger.error("Failed to connect to database for fetching metadata during search.")
-            return []
+        # FAISS returns -1 for indices if k is larger than the number of vectors.
+        # tolist() converts the whole result to Python ints/floats in one C call (plain
+        # ints also avoid PostgreSQL adaptation issues) instead of boxing numpy scalars
+        return [
+            [(faiss_id, distance) for faiss_id, distance in zip(row_ids, row_distances) if faiss_id != -1]
+            for row_ids, row_distances in zip(indices.tolist(), distances.tolist())
+        ]
 
-        try:
-            # Fetch metadata for each returned FAISS ID
-            for i in range(len(indices[0])):
-                faiss_id = indices[0][i]
-                distance = distances[0][i]
-                
-                # FAISS returns -1 for indices if k is larger than the number of vectors
-                if faiss_id == -1:
-                    continue 
-                    
-                # Convert numpy.int64 to regular Python int to avoid PostgreSQL adaptation issues
-                faiss_id = int(faiss_id)
-                    
-                # Query metadata
-                select_metadata_query = """
-                SELECT user_id, created_at FROM embeddings_metadata WHERE embedding_id = %s;
-                """
-                rows = db_conn.execute_query(select_metadata_query, (faiss_id,))
-                if rows and len(rows) > 0:
-                    # Assuming RealDictCursor, rows are dict-like
-                    user_id = rows[0]['user_id']
-                    created_at = rows[0]['created_at']
-                    results.append((faiss_id, distance, user_id, created_at))
-                else:
-                    logger.warning(f"No metadata found for FAISS ID {faiss_id}")
-                    
-            return results
-        finally:
-            db_conn.disconnect()
-                
     except Exception as e:
         logger.error(f"Error searching FAISS index: {e}")
         return []
 
+def _result_buffers(nq, k):
+    """Returns this thread's (nq, k) distance and ID arrays for index.search, growing them as needed."""
+    distances = getattr(_search_buffers, "distances", None)
+    if distances is None or distances.shape[0] < nq or distances.shape[1] != k:
+        distances = _search_buffers.distances = np.empty((nq, k), dtype=np.float32)
+        _search_buffers.indices = np.empty((nq, k), dtype=np.int64)
+    return distances[:nq], _search_buffers.indices[:nq]
+
+def get_metadata(faiss_ids):
+    """
+    Returns {faiss_id: (user_id, created_at)} for the given FAISS IDs. Cached rows
+    are served from memory; the rest are fetched with a single query.
+    IDs without a metadata row are left out.
+    """
+    _expire_metadata_cache()
+    missing_ids = [faiss_id for faiss_id in faiss_ids if faiss_id not in _metadata_cache]
+    if missing_ids:
+        _fetch_metadata(missing_ids)
+    metadata = {}
+    for faiss_id in faiss_ids:
+        row = _metadata_cache.get(faiss_id)
+        if row is not None:
+            metadata[faiss_id] = row
+    return metadata
+
+def _expire_metadata_cache():
+    """Drops the metadata cache once it is older than METADATA_CACHE_TTL."""
+    global _metadata_cache_expires
+    now = time.monotonic()
+    if now >= _metadata_cache_expires:
+        _metadata_cache.clear()
+        _metadata_cache_expires = now + METADATA_CACHE_TTL
+
+def _fetch_metadata(embedding_ids):
+    """Loads the metadata rows for the given embedding IDs into the cache with one query."""
+    db_conn = DatabaseConnection()
+    if not db_conn.connect():
+        logger.error("Failed to connect to database for fetching metadata during search.")
+        return
+
+    try:
+        select_metadata_query = """
+        SELECT embedding_id, user_id, created_at FROM embeddings_metadata WHERE embedding_id = ANY(%s);
+        """
+        rows = db_conn.execute_query(select_metadata_query, (list(embedding_ids),))
+        # Assuming RealDictCursor, rows are dict-like
+        for row in rows or []:
+            _metadata_cache[row['embedding_id']] = (row['user_id'], row['created_at'])
+    finally:
+        db_conn.disconnect()
+
+def _warm_metadata_cache(db_conn):
+    """Loads the whole embeddings_metadata table into the cache."""
+    global _metadata_cache_expires
+    _metadata_cache_expires = time.monotonic() + METADATA_CACHE_TTL
+    rows = db_conn.execute_query("SELECT embedding_id, user_id, created_at FROM embeddings_metadata;")
+    for row in rows or []:
+        _metadata_cache[row['embedding_id']] = (row['user_id'], row['created_at'])
+    logger.info(f"Cached metadata for {len(_metadata_cache)} embeddings")
+
 def save_index(path):
-    """Saves the FAISS index to a file."""
-    global index
+    """
+    Saves the FAISS index to a file.
+    The index is written to a temporary file and renamed over the target, so a
+    crash mid-write never leaves a truncated index behind.
+    """
+    global index, index_file, dirty
     if index is None:
         logger.error("FAISS index is not initialized. Nothing to save.")
         return
+    tmp_path = f"{path}.tmp"
+    try:
+        # Snapshot under the read lock so additions only wait for the in-memory copy,
+        # not the disk write; everything in the snapshot is covered by dirty = False
+        with _index_lock.read():
+            data = faiss.serialize_index(index)
+            dirty = False
+    except Exception as e:
+        logger.error(f"Error serializing FAISS index for {path}: {e}")
+        return
     try:
-        faiss.write_index(index, path)
+        with open(tmp_path, "wb") as f:
+            f.write(data.tobytes())
+        os.replace(tmp_path, path)
+        index_file = path
         logger.info(f"FAISS index saved to {path}")
     except Exception as e:
+        dirty = True
         logger.error(f"Error saving FAISS index to {path}: {e}")
 
+def flush():
+    """Writes the index to index_file if it has unsaved additions. Returns True if written."""
+    global _flush_timer
+    with _flush_lock:
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+        if not dirty or index_file is None:
+            return False
+        save_index(index_file)
+        return not dirty
+
+def schedule_flush(delay=FLUSH_DELAY):
+    """
+    Requests a deferred flush() after `delay` seconds. Calls made while a flush is
+    already pending are folded into it, so back-to-back additions share one write.
+    """
+    global _flush_timer
+    with _flush_lock:
+        if _flush_timer is not None:
+            return
+        _flush_timer = threading.Timer(delay, flush)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+# Pending additions are written out on interpreter exit
+atexit.register(flush)
+
 def get_index_stats():
     """Returns basic statistics about the FAISS index."""
     global index, next_embedding_id
@@ -209,7 +895,7 @@ def get_index_stats():
         "initialized": True,
         "dimension": dimension,
         "total_vectors": index.ntotal,
-        "next_embedding_id": next_embedding_id # This might not be perfectly accurate after loading
+        "next_embedding_id": next_embedding_id
     }
 
 def get_template_embedding(template_user_id=-1):
@@ -249,12 +935,13 @@ def get_template_embedding(template_user_id=-1):
             template_faiss_id = rows[0]['embedding_id']
             logger.info(f"Found template with FAISS ID: {template_faiss_id} for user_id: {template_user_id}")
             
-            # Reconstruct the vector from the index using its internal ID
-            # This works for IndexFlat. For IndexIVF, you might need to enable storage of original vectors
-            # or use a different approach.
-            if hasattr(index, 'reconstruct'):
+            # Reconstruct the vector from the index using its internal ID.
+            # IVF indexes get a direct map in _prepare_index(); Refine indexes
+            # reconstruct from their FP16 refinement copy.
+            if can_reconstruct:
                 try:
-                    reconstructed_vector = index.reconstruct(template_faiss_id)
+                    with _index_lock.read():
+                        reconstructed_vector = index.reconstruct(template_faiss_id)
                     logger.info("Template embedding reconstructed from FAISS index.")
                     return reconstructed_vector
                 except Exception as reconstruct_error: